@@ -0,0 +1,437 @@
+import argparse
+import contextlib
+import html
+import http.server
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+from crawler_engine import CrawlEngine
+from crawler_export import EXPORT_FORMATS
+from crawler_extract import check_parity
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，此时不统计内存峰值
+    resource = None
+
+
+# 合成正文使用的常用汉字
+CJK_SAMPLE = ('的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动'
+              '同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自'
+              '二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日')
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """最近秩法计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+class SyntheticSite:
+    """本地合成的博客站点
+
+    页面地址仿照 Blogspot 文章格式（/年/月/post-N.html），首页链接到前几篇文章，
+    每篇文章链接到下一篇（保证全部可达）以及 fanout 篇随机文章。
+    页面结构与 ArticleExtractor 的提取规则一致。sitemap 为True时还提供
+    robots.txt 和列出全部文章的 /sitemap.xml（见 crawler_discovery）。
+    HTTP服务运行在单独的进程中，其CPU时间和内存不计入爬虫的测量结果。
+
+    属性:
+        articles: 文章列表，每项为 (标题, 日期, 正文)
+        fanout: 每个页面指向其他文章的链接数
+        latency: 每个请求注入的延迟（秒）
+        jitter: 延迟的随机浮动范围（秒）
+        error_rate: 返回 503 的请求比例
+        sitemap: 是否提供 robots.txt 和站点地图
+        requests: 服务收到的请求数
+        errors: 注入的 503 错误数
+    """
+
+    def __init__(self, articles: List[tuple], fanout: int = 5, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, seed: int = 42,
+                 sitemap: bool = True):
+        self.articles = articles
+        self.fanout = fanout
+        self.sitemap = sitemap
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pages = self._build_pages(seed)
+        self._requests = self._errors = None  # 与服务进程共享的计数
+        self.server = None
+        self.process = None
+
+    def __getstate__(self):
+        # 传给服务进程时不包含锁、服务和进程对象
+        state = self.__dict__.copy()
+        for key in ('_lock', 'server', 'process'):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self.server = self.process = None
+
+    @property
+    def requests(self) -> int:
+        return self._requests.value if self._requests is not None else 0
+
+    @property
+    def errors(self) -> int:
+        return self._errors.value if self._errors is not None else 0
+
+    @classmethod
+    def from_database(cls, db_path: str, pages: int, **kwargs) -> 'SyntheticSite':
+        """用已爬取的文章生成站点，文章不足时循环使用"""
+        rows = []
+        if os.path.exists(db_path):
+            conn = sqlite3.connect(db_path)
+            try:
+                rows = conn.execute(
+                    "SELECT title, date, content FROM pages WHERE content != '' LIMIT ?",
+                    (pages,)).fetchall()
+            except sqlite3.Error:
+                rows = []
+            finally:
+                conn.close()
+        if not rows:
+            print(f'{db_path} 中没有可用的文章，改用合成文字', file=sys.stderr)
+            return cls.synthetic(pages, **kwargs)
+        articles = [(title or '无标题', date or '', content) for title, date, content in rows]
+        return cls([articles[i % len(articles)] for i in range(pages)], **kwargs)
+
+    @classmethod
+    def synthetic(cls, pages: int, length: int = 1500, seed: int = 42, **kwargs) -> 'SyntheticSite':
+        """用随机汉字生成站点，相同的 seed 生成相同的内容"""
+        rng = random.Random(seed)
+        articles = []
+        for i in range(pages):
+            words = [''.join(rng.choices(CJK_SAMPLE, k=rng.randint(2, 12)))
+                     for _ in range(length // 7)]
+            articles.append((f'文章 {i} {words[0]}', f'2024/{i % 12 + 1:02d}/{i % 28 + 1:02d}',
+                             '，'.join(words) + '。'))
+        return cls(articles, seed=seed, **kwargs)
+
+    @staticmethod
+    def article_path(i: int) -> str:
+        return f'/{2024 - i // 1200}/{i // 100 % 12 + 1:02d}/post-{i}.html'
+
+    def _build_pages(self, seed: int) -> Dict[str, bytes]:
+        rng = random.Random(seed)
+        count = len(self.articles)
+        pages = {}
+        for i, (title, date, content) in enumerate(self.articles):
+            targets = {(i + 1) % count} | {rng.randrange(count) for _ in range(self.fanout)}
+            pages[self.article_path(i)] = self._render(title, date, content, targets)
+        home_links = set(range(min(count, max(self.fanout, 1))))
+        pages['/'] = self._render('首页', '', '', home_links)
+        return pages
+
+    def _render(self, title: str, date: str, content: str, targets) -> bytes:
+        links = ''.join(f'<li><a href="{self.article_path(j)}">文章 {j}</a></li>' for j in sorted(targets))
+        return (
+            f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)}</title></head>'
+            f'<body><span class="date">{html.escape(date)}</span>'
+            f'<div class="post-content"><p>{html.escape(content)}</p></div>'
+            f'<ul>{links}</ul></body></html>'
+        ).encode('utf-8')
+
+    def _render_sitemap(self, base_url: str) -> bytes:
+        entries = []
+        for i, (_, date, _) in enumerate(self.articles):
+            lastmod = f'<lastmod>{date.replace("/", "-")}</lastmod>' if date.count('/') == 2 else ''
+            entries.append(f'<url><loc>{base_url}{self.article_path(i)}</loc>{lastmod}</url>')
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                + ''.join(entries) + '</urlset>').encode('utf-8')
+
+    @property
+    def page_count(self) -> int:
+        return len(self.articles) + 1
+
+    def start(self) -> str:
+        """在子进程中启动HTTP服务，返回首页URL"""
+        context = multiprocessing.get_context('spawn')
+        self._requests = context.Value('q', 0, lock=False)
+        self._errors = context.Value('q', 0, lock=False)
+        receiver, sender = context.Pipe(duplex=False)
+        self.process = context.Process(target=self._serve, args=(sender,), name='synthetic-site', daemon=True)
+        self.process.start()
+        sender.close()
+        try:
+            base_url = receiver.recv()
+        except EOFError:
+            raise RuntimeError('合成站点的服务进程启动失败') from None
+        finally:
+            receiver.close()
+        return base_url + '/'
+
+    def _serve(self, sender):
+        """服务进程：启动HTTP服务，把站点地址发回父进程后一直运行到被终止"""
+        site = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # 响应头和响应体分两次写出，关闭 Nagle 算法以免触发延迟确认的等待
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with site._lock:
+                    site._requests.value += 1
+                    delay = site.latency + site._rng.uniform(0, site.jitter)
+                    failed = site._rng.random() < site.error_rate
+                    site._errors.value += failed
+                if delay:
+                    time.sleep(delay)
+                path = self.path.split('?')[0].split('#')[0]
+                body = site._pages.get(path)
+                status = 503 if failed else 200 if body is not None else 404
+                if status != 200:
+                    body = b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/plain; charset=utf-8' if path == '/robots.txt' else
+                                 'application/xml; charset=utf-8' if path.endswith('.xml') else
+                                 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        if self.sitemap:
+            self._pages['/robots.txt'] = (f'User-agent: *\nDisallow: /search\n'
+                                          f'Sitemap: {base_url}/sitemap.xml\n').encode('utf-8')
+            self._pages['/sitemap.xml'] = self._render_sitemap(base_url)
+        sender.send(base_url)
+        sender.close()
+        self.server.serve_forever()
+
+    def stop(self):
+        if self.process:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+
+
+def _resource_usage() -> Dict[str, float]:
+    """本进程及已回收子进程（解析进程池）的CPU时间与内存峰值"""
+    if resource is None:
+        return {'cpu': time.process_time(), 'max_rss_kb': 0, 'children_max_rss_kb': 0}
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # macOS 的 ru_maxrss 单位是字节，Linux 是KB
+    scale = 1024 if sys.platform == 'darwin' else 1
+    return {
+        'cpu': own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+        'max_rss_kb': own.ru_maxrss / scale,
+        'children_max_rss_kb': children.ru_maxrss / scale,
+    }
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for folder, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(folder, name))
+            except OSError:
+                pass
+    return total
+
+
+def run_benchmark(site: SyntheticSite, workers: int = 8, rate: float = 1000.0,
+                  extract_workers: Optional[int] = None, export_format: str = 'segments',
+                  discover: bool = True, verbose: bool = False) -> Dict:
+    """对合成站点完整执行一次爬取并统计性能
+
+    每次运行使用新的临时数据库和缓存目录，结果与已有缓存无关。
+
+    Args:
+        site: 合成站点（尚未启动）
+        workers: 同时在途的请求数
+        rate: 每个站点每秒请求数
+        extract_workers: 解析进程数，默认等于CPU核数
+        export_format: 文章导出格式（见 crawler_export）
+        discover: 是否在爬取前读取 robots.txt 和站点地图
+        verbose: 是否显示爬虫自身的输出
+
+    Returns:
+        Dict: 配置与测量结果
+    """
+    workdir = tempfile.mkdtemp(prefix='crawler_bench_')
+    start_url = site.start()
+    errors = []
+    latencies = []
+    try:
+        engine = CrawlEngine(os.path.join(workdir, 'bench.db'),
+                             cache_dir=os.path.join(workdir, 'cache'),
+                             extract_workers=extract_workers, export_format=export_format,
+                             on_error=lambda url, e: errors.append(url))
+        engine.configure(max_workers=workers, host_rate=rate)
+        engine.resume_crawl = False
+        engine.discover = engine.respect_robots = discover
+
+        # 记录每个请求的总耗时（FetchResult.timing 由传输层测量）
+        transport_get = engine.transport.get
+
+        def timed_get(url, headers=None, **kwargs):
+            result = transport_get(url, headers=headers, **kwargs)
+            latencies.append(result.timing['total'])
+            return result
+        engine.transport.get = timed_get
+
+        before = _resource_usage()
+        bytes_before = _directory_size(workdir)
+        started = time.perf_counter()
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            finished = engine.crawl([start_url])
+            engine.close()
+        elapsed = time.perf_counter() - started
+        # 站点服务进程在 finally 中才结束回收，不计入子进程的统计
+        after = _resource_usage()
+
+        pages = engine.crawled_count
+        cpu = after['cpu'] - before['cpu']
+        return {
+            'config': {
+                'pages': site.page_count,
+                'fanout': site.fanout,
+                'latency_ms': site.latency * 1000,
+                'jitter_ms': site.jitter * 1000,
+                'error_rate': site.error_rate,
+                'workers': workers,
+                'rate': rate,
+                'extract_workers': engine.extract_workers,
+                'export_format': export_format,
+                'sitemap': site.sitemap,
+                'discover': discover,
+            },
+            'results': {
+                'finished': finished,
+                'pages_crawled': pages,
+                'requests': len(latencies),
+                'discovered': engine.discovered_count,
+                'server_errors_injected': site.errors,
+                'errors_reported': len(errors),
+                'elapsed_s': round(elapsed, 3),
+                'pages_per_s': round(pages / elapsed, 2) if elapsed else 0.0,
+                'latency_p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+                'latency_p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+                'cpu_s': round(cpu, 3),
+                'cpu_ms_per_page': round(cpu / pages * 1000, 3) if pages else 0.0,
+                'peak_rss_mb': round(after['max_rss_kb'] / 1024, 1),
+                'peak_child_rss_mb': round(after['children_max_rss_kb'] / 1024, 1),
+                'bytes_written': _directory_size(workdir) - bytes_before,
+            },
+            'stages': {name: {key: round(value, 3) for key, value in stats.items()}
+                       for name, stats in engine.profiler.stats().items()},
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+        }
+    finally:
+        site.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare_results(baseline: Dict, current: Dict) -> Dict[str, Dict]:
+    """对比两次测量结果中的数值指标
+
+    Returns:
+        Dict: 指标 -> {baseline, current, change_percent}
+    """
+    changes = {}
+    for key, value in current['results'].items():
+        old = baseline.get('results', {}).get(key)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+            continue
+        changes[key] = {
+            'baseline': old,
+            'current': value,
+            'change_percent': round((value - old) / old * 100, 1) if old else None,
+        }
+    return changes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='在本地合成站点上测量爬虫吞吐量，结果输出为JSON')
+    parser.add_argument('--pages', type=int, default=500, help='文章页数（默认 500）')
+    parser.add_argument('--fanout', type=int, default=5, help='每页指向其他文章的链接数（默认 5）')
+    parser.add_argument('--latency', type=float, default=20, help='每个请求注入的延迟，毫秒（默认 20）')
+    parser.add_argument('--jitter', type=float, default=0, help='延迟的随机浮动范围，毫秒')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 503 的请求比例（0~1）')
+    parser.add_argument('--source', choices=('synthetic', 'db'), default='synthetic',
+                        help='页面内容来源：随机汉字或已有数据库中的文章')
+    parser.add_argument('--source-db', default='crawler_data.db', help='--source db 时读取的数据库')
+    parser.add_argument('--length', type=int, default=1500, help='合成正文的大致字数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子，相同种子生成相同站点')
+    parser.add_argument('-w', '--workers', type=int, default=8, help='同时在途的请求数（默认 8）')
+    parser.add_argument('-r', '--rate', type=float, default=1000, help='每站点每秒请求数（默认 1000）')
+    parser.add_argument('--extract-workers', type=int, default=None, help='解析进程数（默认CPU核数）')
+    parser.add_argument('--export', choices=EXPORT_FORMATS, default='segments',
+                        help='文章导出格式（默认 segments）')
+    parser.add_argument('--no-sitemap', action='store_true', help='站点不提供 robots.txt 和站点地图')
+    parser.add_argument('--no-discovery', action='store_true', help='爬虫不读取站点地图，只跟随页面链接')
+    parser.add_argument('-o', '--output', help='结果JSON文件，默认输出到标准输出')
+    parser.add_argument('--compare', help='与之前保存的结果JSON对比')
+    parser.add_argument('-v', '--verbose', action='store_true', help='显示爬虫自身的输出')
+    parser.add_argument('--parity', action='store_true',
+                        help='只检查 lxml 与 BeautifulSoup 在边界用例上的提取结果是否一致')
+    args = parser.parse_args(argv)
+
+    if args.parity:
+        parity = check_parity()
+        print(json.dumps(parity, ensure_ascii=False, indent=2))
+        return 0 if all(parity.values()) else 1
+
+    site_options = dict(fanout=args.fanout, latency=args.latency / 1000,
+                        jitter=args.jitter / 1000, error_rate=args.error_rate, seed=args.seed,
+                        sitemap=not args.no_sitemap)
+    if args.source == 'db':
+        site = SyntheticSite.from_database(args.source_db, args.pages, **site_options)
+    else:
+        site = SyntheticSite.synthetic(args.pages, length=args.length, **site_options)
+
+    result = run_benchmark(site, workers=args.workers, rate=args.rate,
+                           extract_workers=args.extract_workers, export_format=args.export,
+                           discover=not args.no_discovery, verbose=args.verbose)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            result['comparison'] = compare_results(json.load(f), result)
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,328 @@
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import socket
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+
+from crawler_engine import CrawlEngine
+from crawler_state import CrawlStateStore
+from crawler_distributed import DEFAULT_LEASE_SECONDS, SqliteWorkQueue, WorkerSession
+from crawler_export import CODECS, EXPORT_FORMATS
+from crawler_filters import DEFAULT_EXCLUDE, DEFAULT_PREFIX_CAPS, UrlFilter, parse_prefix_cap
+
+
+class JsonlExporter:
+    """把本次爬取得到的文章逐行写入 JSONL 文件
+
+    属性:
+        path: 输出文件路径（追加写入）
+        count: 已写入的文章数
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, article_data: Dict):
+        record = {key: article_data.get(key) for key in
+                  ('url', 'title', 'publish_date', 'content', 'links', 'crawl_time')}
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+class ProgressPrinter:
+    """把引擎的进度文字输出到标准错误，最多每 interval 秒一条"""
+
+    def __init__(self, interval: float = 1.0, quiet: bool = False):
+        self.interval = interval
+        self.quiet = quiet
+        self._last = 0.0
+
+    def __call__(self, text: str):
+        now = time.monotonic()
+        if self.quiet or now - self._last < self.interval:
+            return
+        self._last = now
+        print(text.replace('\n', ' | '), file=sys.stderr)
+
+
+def regex(value: str) -> str:
+    """命令行中的正则参数，格式错误时由 argparse 报告"""
+    try:
+        re.compile(value)
+    except re.error as e:
+        raise argparse.ArgumentTypeError(f'正则表达式无效: {value} ({e})')
+    return value
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description='无界面的网站爬虫：爬取、存储与全文搜索')
+    parser.add_argument('--db', default='crawler_data.db', help='文章与爬取状态数据库（默认 crawler_data.db）')
+    parser.add_argument('--cache-dir', default='cache', help='旧版缓存及txt文章目录（默认 cache）')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    # crawl 与 worker 共用的爬取选项
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument('-w', '--workers', type=int, default=5, help='同时在途的请求数（默认 5）')
+    options.add_argument('-r', '--rate', type=float, default=2.0, help='每个站点每秒请求数（默认 2）')
+    options.add_argument('--extract-workers', type=int, default=None,
+                         help='解析进程数，0 表示在下载线程中解析（默认CPU核数）')
+    options.add_argument('--max-pages', type=int, default=None, help='最多爬取的页面数')
+    options.add_argument('--no-resume', action='store_true', help='不从上次中断处继续')
+    options.add_argument('--revalidate', action='store_true',
+                         help='增量更新：过期缓存用 ETag/Last-Modified 向服务器校验')
+    options.add_argument('--no-discovery', action='store_true',
+                         help='不读取站点地图和订阅，只从页面链接发现文章')
+    options.add_argument('--ignore-robots', action='store_true', help='不遵守 robots.txt 的 Disallow 规则')
+    options.add_argument('--include', action='append', default=[], type=regex, metavar='REGEX',
+                         help='只爬取匹配该正则的URL（可重复，匹配任一即可）')
+    options.add_argument('--exclude', action='append', default=[], type=regex, metavar='REGEX',
+                         help='不爬取匹配该正则的URL（可重复，在默认规则之外追加）')
+    options.add_argument('--max-depth', type=int, default=None, help='与起始页的最大链接距离')
+    options.add_argument('--prefix-cap', action='append', default=[], type=parse_prefix_cap,
+                         metavar='PREFIX=N', help='路径前缀下最多爬取的URL数，如 /search=50（可重复）')
+    options.add_argument('--no-default-filters', action='store_true',
+                         help='不使用默认的排除规则和 /search 上限')
+    options.add_argument('--trace', metavar='FILE',
+                         help='把各阶段的起止时间导出为 Chrome trace 文件（chrome://tracing 或 Perfetto 打开）')
+    options.add_argument('--sample', metavar='FILE',
+                         help='爬取期间运行采样分析器，结果导出为 speedscope 文件')
+    options.add_argument('--jsonl', help='把本次爬取的文章追加写入 JSONL 文件')
+    options.add_argument('--export', choices=EXPORT_FORMATS, default='segments',
+                         help='文章导出格式：压缩段文件、每篇一个txt文件或不导出（默认 segments）')
+    options.add_argument('--codec', choices=tuple(CODECS), default='gzip',
+                         help='段文件压缩格式（zstd 需要安装 zstandard，默认 gzip）')
+    options.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS,
+                         help='分布式爬取时worker的租约时长，worker崩溃后其URL在该时间后被重新分配')
+    options.add_argument('-q', '--quiet', action='store_true', help='不输出进度')
+
+    crawl = commands.add_parser('crawl', parents=[options], help='从起始URL开始爬取')
+    crawl.add_argument('seeds', nargs='+', help='起始URL')
+    crawl.add_argument('-p', '--processes', type=int, default=1,
+                       help='worker 进程数；大于 1 时本进程作为协调者，各进程共享数据库中的爬取队列')
+
+    worker = commands.add_parser('worker', parents=[options],
+                                 help='在本机加入已有的分布式爬取任务（任务ID由 crawl -p 输出，'
+                                      '数据库须在本机磁盘上，不支持网络文件系统）')
+    worker.add_argument('job', type=int, help='任务ID')
+    worker.add_argument('--worker-id', default=None, help='worker 标识（默认 主机名-进程号）')
+    worker.add_argument('--total-workers', type=int, default=1,
+                        help='参与任务的worker总数，用于平均分配站点分区（默认 1）')
+
+    search = commands.add_parser('search', help='在已缓存文章中全文搜索')
+    search.add_argument('keyword', help='搜索关键词')
+    search.add_argument('-n', '--limit', type=int, default=20, help='最多返回的结果数（默认 20）')
+    return parser
+
+
+def create_engine(args, cache_dir: Optional[str] = None, export_format: Optional[str] = None,
+                  extract_workers: Optional[int] = None, **callbacks) -> CrawlEngine:
+    """按命令行选项创建并配置引擎，export_format、extract_workers 不为None时覆盖命令行选项"""
+    export_format = export_format or args.export
+    engine = CrawlEngine(
+        args.db, cache_dir=cache_dir or args.cache_dir,
+        extract_workers=args.extract_workers if extract_workers is None else extract_workers,
+        export_format=export_format,
+        export_options={'codec': args.codec} if export_format == 'segments' else None,
+        on_error=lambda url, e: print(f'爬取 {url} 时出错: {str(e)}', file=sys.stderr),
+        **callbacks)
+    engine.configure(max_workers=args.workers, host_rate=args.rate)
+    engine.resume_crawl = not args.no_resume
+    engine.revalidate = args.revalidate
+    engine.discover = not args.no_discovery
+    engine.respect_robots = not args.ignore_robots
+    prefix_caps = {} if args.no_default_filters else dict(DEFAULT_PREFIX_CAPS)
+    prefix_caps.update(args.prefix_cap)
+    engine.url_filter = UrlFilter(
+        include=args.include,
+        exclude=args.exclude + ([] if args.no_default_filters else list(DEFAULT_EXCLUDE)),
+        max_depth=args.max_depth, prefix_caps=prefix_caps)
+    engine.trace_path = args.trace
+    engine.sample_path = args.sample
+    if args.max_pages:
+        engine.max_articles = args.max_pages
+    return engine
+
+
+def run_engine(args, seeds: List[str], cache_dir: Optional[str] = None,
+               shared: Optional[WorkerSession] = None) -> int:
+    """运行一次爬取（单机或作为 worker），输出摘要
+
+    Returns:
+        int: 退出码，被 Ctrl+C 停止时为 130，爬取出错中止时为 1
+    """
+    exporter = JsonlExporter(args.jsonl) if args.jsonl else None
+    engine = create_engine(args, cache_dir, on_progress=ProgressPrinter(quiet=args.quiet),
+                           on_article=exporter.write if exporter else None)
+
+    # 爬取在后台线程中进行，主线程等待 Ctrl+C，以便停止时保存检查点
+    interrupted = False
+    errors = []
+
+    def crawl():
+        try:
+            engine.crawl(seeds, shared)
+        except Exception as e:
+            errors.append(e)
+            traceback.print_exc()
+
+    worker = threading.Thread(target=crawl)
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(0.5)
+    except KeyboardInterrupt:
+        print('正在停止，等待进行中的请求完成...', file=sys.stderr)
+        interrupted = True
+        engine.stop()
+        worker.join()
+    finally:
+        engine.close()
+        if exporter:
+            exporter.close()
+
+    print(engine.summary(), file=sys.stderr)
+    if exporter:
+        print(f'已导出 {exporter.count} 篇文章到 {args.jsonl}', file=sys.stderr)
+    if errors:
+        print(f'爬取出错中止: {str(errors[0])}', file=sys.stderr)
+        return 1
+    return 130 if interrupted else 0
+
+
+def run_crawl(args) -> int:
+    if args.processes > 1:
+        return run_coordinator(args)
+    return run_engine(args, args.seeds)
+
+
+def run_worker(args, worker_id: Optional[str] = None, cache_dir: Optional[str] = None) -> int:
+    """作为 worker 加入分布式爬取任务
+
+    起始URL从任务对应的会话中读取（用于获取 robots.txt 规则），
+    待爬取的URL全部从共享队列领取。
+    """
+    queue = SqliteWorkQueue(args.db)
+    seed = CrawlStateStore(args.db).session_seed(args.job)
+    if seed is None:
+        print(f'任务 {args.job} 不存在', file=sys.stderr)
+        return 2
+    worker_id = worker_id or args.worker_id or f'{socket.gethostname()}-{os.getpid()}'
+    shared = WorkerSession(queue, args.job, worker_id, workers=args.total_workers,
+                           lease_seconds=args.lease_seconds)
+    try:
+        return run_engine(args, seed.split(' '), cache_dir, shared)
+    finally:
+        queue.close()
+
+
+def _worker_process(args, index: int):
+    """协调者启动的 worker 进程入口，各 worker 的导出文件写入各自的子目录"""
+    if args.jsonl:
+        stem, ext = os.path.splitext(args.jsonl)
+        args.jsonl = f'{stem}-{index}{ext}'
+    for option in ('trace', 'sample'):
+        path = getattr(args, option)
+        if path:
+            stem, ext = os.path.splitext(path)
+            setattr(args, option, f'{stem}-{index}{ext}')
+    worker_id = f'{socket.gethostname()}-{os.getpid()}-{index}'
+    sys.exit(run_worker(args, worker_id, os.path.join(args.cache_dir, f'worker-{index}')))
+
+
+def run_coordinator(args) -> int:
+    """协调者：创建分布式爬取任务并在本机启动 worker 进程
+
+    该方法负责:
+    1. 打开（或恢复）任务，读取 robots.txt、站点地图和订阅，把起始URL写入共享队列
+    2. 启动 processes 个 worker 进程，按站点哈希分区领取URL
+    3. 定期输出共享队列的进度；本机的其他进程可用 worker 子命令以同一任务ID加入
+    4. 全部 worker 退出后，队列已爬空则结束任务，否则保留检查点以便继续
+
+    Returns:
+        int: 退出码
+    """
+    queue = SqliteWorkQueue(args.db)
+    engine = create_engine(args, export_format='none', extract_workers=0,
+                           on_progress=ProgressPrinter(interval=0, quiet=args.quiet))
+    try:
+        job = engine.open_shared_job(args.seeds, queue)
+    finally:
+        engine.close()
+    print(f'任务 {job.session_id}: 发现 {engine.discovered_count} 个URL，'
+          f'启动 {args.processes} 个 worker（本机可再运行 worker {job.session_id} 加入）',
+          file=sys.stderr)
+
+    # 每个 worker 默认分到平均份额的解析进程
+    if args.extract_workers is None:
+        args.extract_workers = max(1, (os.cpu_count() or 1) // args.processes)
+    args.job, args.total_workers, args.worker_id = job.session_id, args.processes, None
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_worker_process, args=(args, index), name=f'worker-{index}')
+                 for index in range(args.processes)]
+    for process in processes:
+        process.start()
+
+    # Ctrl+C 同时发给各 worker 进程，它们各自停止并把未完成的URL退回队列
+    interrupted = False
+    last_report = 0.0
+    try:
+        while any(process.is_alive() for process in processes):
+            for process in processes:
+                process.join(0.5)
+            if not args.quiet and time.monotonic() - last_report >= 5:
+                last_report = time.monotonic()
+                counts = queue.counts(job.session_id)
+                print(f'任务 {job.session_id}: 已完成 {counts["done"]} 个，进行中 {counts["leased"]} 个，'
+                      f'待爬取 {counts["queued"]} 个', file=sys.stderr)
+    except KeyboardInterrupt:
+        print('正在停止，等待各 worker 退出...', file=sys.stderr)
+        interrupted = True
+        for process in processes:
+            process.join()
+
+    counts = queue.counts(job.session_id)
+    finished = not interrupted and counts['queued'] + counts['leased'] == 0
+    job.close('finished' if finished else 'stopped')
+    queue.close()
+    print(f'任务 {job.session_id} {"已完成" if finished else "未完成，可再次运行以继续"}: '
+          f'已完成 {counts["done"]} 个，未完成 {counts["queued"] + counts["leased"]} 个', file=sys.stderr)
+    if interrupted:
+        return 130
+    return 0 if finished else 1
+
+
+def run_search(args) -> int:
+    engine = CrawlEngine(args.db, cache_dir=args.cache_dir, extract_workers=0, export_format='none')
+    try:
+        for article in engine.search(args.keyword, args.limit):
+            print(json.dumps({key: article[key] for key in
+                              ('url', 'title', 'publish_date', 'score', 'snippet')},
+                             ensure_ascii=False))
+    finally:
+        engine.close()
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == 'crawl':
+        return run_crawl(args)
+    if args.command == 'worker':
+        return run_worker(args)
+    return run_search(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
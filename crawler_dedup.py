@@ -0,0 +1,80 @@
+import hashlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from crawler_search import tokenize
+
+# 正文少于该字数时不计算指纹（导航页、空白页之间的“重复”没有意义）
+MIN_FINGERPRINT_LENGTH = 50
+
+SIMHASH_BITS = 64
+# SimHash 按 16 位分为 4 段：汉明距离不超过 3 的两个指纹至少有一段完全相同
+SIMHASH_BANDS = 4
+SIMHASH_BAND_BITS = SIMHASH_BITS // SIMHASH_BANDS
+# 汉明距离不超过该值视为近似重复
+NEAR_DUPLICATE_DISTANCE = 3
+
+
+def content_hash(content: str) -> str:
+    """正文的精确指纹（SHA-1），正文应已规范化空白字符"""
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+# 第 i 张表把字节映射为其从高位数第 i 位的值（0 或 1），见 simhash
+_BIT_TABLES = [bytes(byte >> (7 - i) & 1 for byte in range(256)) for i in range(8)]
+
+
+def simhash(content: str) -> int:
+    """正文的 64 位 SimHash，相似的正文得到汉明距离很小的指纹
+
+    特征使用与全文索引相同的切分（中文按二元组），权重为出现次数。
+    所有特征的 8 字节哈希按权重重复后拼接为一个 bytes，
+    每一位的计数用切片、translate 和 count 完成，避免逐特征逐位的 Python 循环。
+
+    Args:
+        content: 正文
+
+    Returns:
+        int: 无符号 64 位指纹
+    """
+    digests = b''.join([hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest() * count
+                        for token, count in Counter(tokenize(content)).items()])
+    total = len(digests) // 8
+    fingerprint = 0
+    for bit in range(SIMHASH_BITS):
+        # 第 bit 位（从高位数）在每个哈希的第 bit // 8 个字节中
+        ones = digests[bit >> 3::8].translate(_BIT_TABLES[bit & 7]).count(1)
+        # 该位为 1 的特征权重超过一半时，指纹的该位为 1
+        if ones * 2 > total:
+            fingerprint |= 1 << (SIMHASH_BITS - 1 - bit)
+    return fingerprint
+
+
+def fingerprint(content: str) -> Dict[str, Optional[object]]:
+    """计算正文的精确指纹和 SimHash，正文过短时均为None
+
+    Returns:
+        Dict: content_hash 与 simhash
+    """
+    if len(content) < MIN_FINGERPRINT_LENGTH:
+        return {'content_hash': None, 'simhash': None}
+    return {'content_hash': content_hash(content), 'simhash': simhash(content)}
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def simhash_bands(value: int) -> List[Tuple[int, int]]:
+    """把指纹拆分为 (段号, 段值) 列表，用于在数据库中检索候选"""
+    mask = (1 << SIMHASH_BAND_BITS) - 1
+    return [(band, value >> (band * SIMHASH_BAND_BITS) & mask) for band in range(SIMHASH_BANDS)]
+
+
+def to_signed(value: int) -> int:
+    """无符号 64 位指纹转为 SQLite 可保存的有符号整数"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
@@ -0,0 +1,280 @@
+import gzip
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+from crawler_frontier import url_priority
+
+
+ROBOTS_PATH = '/robots.txt'
+# robots.txt 中没有 Sitemap 行时尝试的默认地址
+DEFAULT_SITEMAP_PATH = '/sitemap.xml'
+# Blogspot / Blogger 的文章订阅（Atom），支持 start-index 和 max-results 分页
+FEED_PATH = '/feeds/posts/default'
+FEED_PAGE_SIZE = 150
+
+# 站点地图和订阅中列出的页面在按URL形态估计的优先级上再加该值，
+# 排在只从页面链接中发现的URL之前
+DISCOVERY_PRIORITY_BONUS = 10
+
+
+def discovered_priority(url: str) -> int:
+    """站点地图或订阅中发现的URL的抓取优先级"""
+    return url_priority(url) + DISCOVERY_PRIORITY_BONUS
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """解析站点地图和订阅中的修改时间
+
+    支持 W3C 日期时间（sitemap 的 lastmod、Atom 的 updated）
+    和 RFC 822 日期（RSS 的 pubDate）。
+
+    Returns:
+        datetime: 转为本地时间且不带时区的时间（与 crawl_time 可直接比较）；无法解析时为None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def _local_name(tag: str) -> str:
+    """去掉 XML 命名空间，{http://www.sitemaps.org/...}loc -> loc"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _parse_xml(content: bytes) -> Optional[ElementTree.Element]:
+    """解析 XML，自动解压 .xml.gz；不是合法 XML 时返回None"""
+    if content[:2] == b'\x1f\x8b':
+        try:
+            content = gzip.decompress(content)
+        except (OSError, EOFError):
+            return None
+    try:
+        return ElementTree.fromstring(content)
+    except ElementTree.ParseError:
+        return None
+
+
+def _child_text(element: ElementTree.Element, name: str) -> Optional[str]:
+    for child in element:
+        if _local_name(child.tag) == name:
+            return (child.text or '').strip() or None
+    return None
+
+
+def parse_sitemap(content: bytes) -> Tuple[List[Tuple[str, Optional[str]]], List[str]]:
+    """解析站点地图或站点地图索引
+
+    Args:
+        content: sitemap.xml（或 .xml.gz）的内容
+
+    Returns:
+        Tuple: ([(页面URL, lastmod)], [子站点地图URL])
+    """
+    root = _parse_xml(content)
+    if root is None:
+        return [], []
+    pages, sitemaps = [], []
+    for entry in root:
+        name = _local_name(entry.tag)
+        if name not in ('url', 'sitemap'):
+            continue
+        loc = _child_text(entry, 'loc')
+        if not loc:
+            continue
+        if name == 'sitemap':
+            sitemaps.append(loc)
+        else:
+            pages.append((loc, _child_text(entry, 'lastmod')))
+    return pages, sitemaps
+
+
+def parse_feed(content: bytes, base_url: str) -> Tuple[List[Tuple[str, Optional[str]]], Optional[str]]:
+    """解析 Atom 或 RSS 订阅
+
+    Args:
+        content: 订阅内容
+        base_url: 订阅地址，用于补全相对链接
+
+    Returns:
+        Tuple: ([(文章URL, 修改时间)], 下一页订阅URL)；没有 rel="next" 链接时下一页为None
+    """
+    root = _parse_xml(content)
+    if root is None:
+        return [], None
+    entries, next_url = [], None
+    if _local_name(root.tag) == 'feed':
+        # Atom：<entry> 中 rel="alternate" 的链接是文章页，<feed> 的 rel="next" 链接是下一页
+        for element in root:
+            name = _local_name(element.tag)
+            if name == 'link' and element.get('rel') == 'next' and element.get('href'):
+                next_url = urljoin(base_url, element.get('href'))
+            elif name == 'entry':
+                for link in element:
+                    if (_local_name(link.tag) == 'link' and link.get('href')
+                            and link.get('rel', 'alternate') == 'alternate'):
+                        modified = _child_text(element, 'updated') or _child_text(element, 'published')
+                        entries.append((urljoin(base_url, link.get('href')), modified))
+                        break
+    else:
+        # RSS 2.0：<rss><channel><item><link>
+        for item in root.iter():
+            if _local_name(item.tag) != 'item':
+                continue
+            link = _child_text(item, 'link')
+            if link:
+                entries.append((urljoin(base_url, link), _child_text(item, 'pubDate')))
+    return entries, next_url
+
+
+class RobotsRules:
+    """一个站点的 robots.txt 规则
+
+    属性:
+        sitemaps: robots.txt 中 Sitemap 行列出的站点地图
+        user_agent: 匹配规则时使用的 User-Agent
+    """
+
+    def __init__(self, text: str = '', user_agent: str = '*'):
+        self.user_agent = user_agent
+        self._parser = RobotFileParser()
+        self._parser.parse(text.splitlines())
+        self.sitemaps = list(self._parser.site_maps() or [])
+
+    def allowed(self, url: str) -> bool:
+        """robots.txt 是否允许抓取该URL"""
+        return self._parser.can_fetch(self.user_agent, url)
+
+
+class SiteDiscovery:
+    """从 robots.txt、站点地图和订阅中批量发现页面
+
+    只靠页面链接发现文章时，需要逐个走过大量标签、归档和搜索页；
+    站点地图和订阅直接列出全部文章及其修改时间，几次请求就能得到成百上千个URL。
+
+    该类负责:
+    1. 读取 robots.txt，得到 Sitemap 行和 Disallow 规则
+    2. 依次读取站点地图（包括站点地图索引中的子站点地图）；没有 Sitemap 行时尝试 /sitemap.xml
+    3. 站点地图中没有页面时，分页读取 Blogspot 的 Atom 订阅 /feeds/posts/default
+
+    请求由调用者提供的 fetch 函数发出（以便遵守站点限速），
+    fetch(url) 返回响应体，失败或状态码不是200时返回None。
+
+    属性:
+        max_sitemaps: 每个站点最多读取的站点地图数
+        max_feed_pages: 每个站点最多读取的订阅页数
+        feed_page_size: 每页订阅的文章数
+        requests: 已发出的请求数
+    """
+
+    def __init__(self, fetch: Callable[[str], Optional[bytes]],
+                 is_running: Callable[[], bool] = lambda: True,
+                 max_sitemaps: int = 100, max_feed_pages: int = 200,
+                 feed_page_size: int = FEED_PAGE_SIZE):
+        self.fetch = fetch
+        self.is_running = is_running
+        self.max_sitemaps = max_sitemaps
+        self.max_feed_pages = max_feed_pages
+        self.feed_page_size = feed_page_size
+        self.requests = 0
+
+    def _fetch(self, url: str) -> Optional[bytes]:
+        self.requests += 1
+        return self.fetch(url)
+
+    def robots(self, site: str) -> RobotsRules:
+        """读取站点的 robots.txt，不存在或读取失败时不限制任何URL
+
+        Args:
+            site: 站点根地址，如 https://example.blogspot.com
+        """
+        content = self._fetch(site + ROBOTS_PATH)
+        if content is None:
+            return RobotsRules()
+        return RobotsRules(content.decode('utf-8', errors='replace'))
+
+    def discover(self, site: str, robots: RobotsRules) -> Tuple[Dict[str, Optional[datetime]], Dict[str, int]]:
+        """发现站点的全部页面
+
+        Args:
+            site: 站点根地址
+            robots: 站点的 robots.txt 规则
+
+        Returns:
+            Tuple: (URL -> 修改时间, {'sitemap': 站点地图中的页面数, 'feed': 订阅中的页面数})
+        """
+        found: Dict[str, Optional[datetime]] = {}
+        counts = {'sitemap': 0, 'feed': 0}
+        for url, modified in self._sitemap_pages(robots.sitemaps or [site + DEFAULT_SITEMAP_PATH]):
+            self._add(found, url, modified)
+            counts['sitemap'] += 1
+        if not found:
+            for url, modified in self._feed_pages(site + FEED_PATH):
+                self._add(found, url, modified)
+                counts['feed'] += 1
+        return found, counts
+
+    @staticmethod
+    def _add(found: Dict[str, Optional[datetime]], url: str, modified: Optional[str]):
+        lastmod = parse_lastmod(modified)
+        previous = found.get(url)
+        if url not in found or (lastmod and (previous is None or lastmod > previous)):
+            found[url] = lastmod
+
+    def _sitemap_pages(self, sitemaps: List[str]):
+        """按广度优先读取站点地图及其子站点地图，逐个产出 (URL, lastmod)"""
+        pending, seen = list(sitemaps), set()
+        while pending and len(seen) < self.max_sitemaps and self.is_running():
+            sitemap_url = pending.pop(0)
+            if sitemap_url in seen:
+                continue
+            seen.add(sitemap_url)
+            content = self._fetch(sitemap_url)
+            if content is None:
+                continue
+            pages, children = parse_sitemap(content)
+            pending.extend(children)
+            yield from pages
+
+    def _feed_pages(self, feed_url: str):
+        """分页读取订阅，逐个产出 (URL, 修改时间)
+
+        优先跟随订阅中的 rel="next" 链接；没有该链接时按 start-index 翻页，
+        某一页不足 feed_page_size 篇时结束。
+        """
+        start = 1
+        url = f'{feed_url}?start-index={start}&max-results={self.feed_page_size}'
+        for _ in range(self.max_feed_pages):
+            if not self.is_running():
+                break
+            content = self._fetch(url)
+            if content is None:
+                break
+            entries, next_url = parse_feed(content, url)
+            yield from entries
+            if next_url:
+                url = next_url
+            elif len(entries) >= self.feed_page_size:
+                start += len(entries)
+                url = f'{feed_url}?start-index={start}&max-results={self.feed_page_size}'
+            else:
+                break
+
+
+def site_root(url: str) -> str:
+    """URL所在站点的根地址（scheme://netloc）"""
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}'
@@ -0,0 +1,443 @@
+import math
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+
+# 站点按主机名哈希分到的分区数；同一时刻每个分区只属于一个worker
+DEFAULT_PARTITIONS = 64
+# worker 领取的分区和URL在该秒数内没有续约即视为该worker已崩溃，重新分配
+DEFAULT_LEASE_SECONDS = 60.0
+
+
+def host_partition(url: str, partitions: int = DEFAULT_PARTITIONS) -> int:
+    """URL所在站点的分区号，同一站点的URL总在同一分区"""
+    return zlib.crc32(urlsplit(url).netloc.encode('utf-8')) % partitions
+
+
+class WorkQueue(ABC):
+    """多个worker共享的爬取队列（后端接口）
+
+    队列中每个URL处于 queued（待爬取）、leased（已被某个worker领取）或 done 之一。
+    站点按主机名哈希分区，worker 先领取分区，再只从自己的分区领取URL：
+    同一站点同一时刻只由一个worker请求，各worker的站点限速仍然有效。
+
+    worker 定期调用 lease 续约；崩溃的worker不再续约，租约到期后它的分区
+    和未完成的URL重新变为可领取。SqliteWorkQueue 把队列保存在爬取检查点的
+    crawl_frontier 表中，MemoryWorkQueue 是进程内的替身；其他后端实现这些方法即可。
+
+    属性:
+        partitions: 分区数
+    """
+
+    partitions = DEFAULT_PARTITIONS
+
+    def prepare(self, job_id: int):
+        """打开任务时调用：补齐旧检查点中缺少的分区号"""
+
+    @abstractmethod
+    def add(self, job_id: int, items: List[Tuple[str, int, int]]):
+        """加入 (URL, 优先级, 链接深度)，已在队列中（包括已完成）的URL忽略"""
+
+    @abstractmethod
+    def done(self, job_id: int, urls: List[str]):
+        """标记URL已完成"""
+
+    @abstractmethod
+    def lease(self, job_id: int, worker_id: str, count: int, workers: int = 1,
+              lease_seconds: float = DEFAULT_LEASE_SECONDS) -> List[Tuple[str, int, int]]:
+        """领取URL并为已领取的分区和URL续约
+
+        该方法负责:
+        1. 回收租约已过期的分区和URL
+        2. 为本worker已领取的分区和URL续约，释放已没有未完成URL的分区
+        3. 需要URL时领取一个有待爬取URL的空闲分区，每个worker最多占有 1/workers 的活跃分区；
+           每次只领取一个，各worker轮流领取，分区数不多时也能大致均分
+        4. 从本worker的分区中按优先级领取至多 count 个URL（count 为 0 时只续约）
+
+        Args:
+            job_id: 任务ID（爬取会话ID）
+            worker_id: worker 标识
+            count: 最多领取的URL数
+            workers: worker 总数，用于计算每个worker可占有的分区数
+            lease_seconds: 租约时长（秒）
+
+        Returns:
+            List: 领取到的 (URL, 优先级, 链接深度)
+        """
+
+    @abstractmethod
+    def release(self, job_id: int, worker_id: str):
+        """worker 正常退出：未完成的URL退回队列，释放全部分区"""
+
+    @abstractmethod
+    def counts(self, job_id: int) -> Dict[str, int]:
+        """各状态的URL数：{'queued': .., 'leased': .., 'done': ..}"""
+
+    def pending(self, job_id: int) -> int:
+        """尚未完成（待爬取或已领取）的URL数"""
+        counts = self.counts(job_id)
+        return counts['queued'] + counts['leased']
+
+
+class SqliteWorkQueue(WorkQueue):
+    """以 SQLite 数据库为共享存储的爬取队列
+
+    在 crawl_frontier 表上增加 host_partition、worker_id、lease_until 和 depth（链接深度）列，
+    领取在 BEGIN IMMEDIATE 事务中完成（先取得写锁再查询和更新），
+    多个进程同时领取也不会拿到同一行。分区的归属记录在 crawl_partitions 表中。
+    数据库使用 WAL 模式，依赖同一台机器上的共享内存，只能由本机的进程共享，
+    不能放在 NFS 等网络文件系统上；跨机器爬取需要实现基于网络服务的 WorkQueue 后端。
+
+    属性:
+        db_path: 数据库文件路径
+        partitions: 分区数
+    """
+
+    def __init__(self, db_path: str = 'crawler_data.db', partitions: int = DEFAULT_PARTITIONS):
+        self.db_path = db_path
+        self.partitions = partitions
+        self._lock = threading.Lock()
+        # 自行管理事务（isolation_level=None），以便使用 BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        """补齐 crawl_frontier 的租约列并创建分区表"""
+        with self._transaction():
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_frontier (
+                    session_id INTEGER,
+                    url TEXT,
+                    priority INTEGER DEFAULT 0,
+                    state TEXT DEFAULT 'queued',
+                    PRIMARY KEY (session_id, url)
+                )
+            ''')
+            columns = {row[1] for row in self.conn.execute('PRAGMA table_info(crawl_frontier)')}
+            for column, definition in (('host_partition', 'INTEGER'), ('worker_id', 'TEXT'),
+                                       ('lease_until', 'REAL'), ('depth', 'INTEGER DEFAULT 0')):
+                if column not in columns:
+                    self.conn.execute(f'ALTER TABLE crawl_frontier ADD COLUMN {column} {definition}')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_frontier_claim ON crawl_frontier '
+                              '(session_id, state, host_partition, priority)')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_partitions (
+                    session_id INTEGER,
+                    partition INTEGER,
+                    worker_id TEXT,
+                    lease_until REAL,
+                    PRIMARY KEY (session_id, partition)
+                )
+            ''')
+
+    @contextmanager
+    def _transaction(self):
+        """写事务：开始时即取得写锁，其他进程的写事务等待（最长 30 秒）"""
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def prepare(self, job_id: int):
+        with self._transaction():
+            urls = [row[0] for row in self.conn.execute(
+                'SELECT url FROM crawl_frontier WHERE session_id = ? AND host_partition IS NULL',
+                (job_id,))]
+            self.conn.executemany(
+                'UPDATE crawl_frontier SET host_partition = ? WHERE session_id = ? AND url = ?',
+                [(host_partition(url, self.partitions), job_id, url) for url in urls])
+
+    def add(self, job_id: int, items: List[Tuple[str, int, int]]):
+        if not items:
+            return
+        with self._transaction():
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO crawl_frontier (session_id, url, priority, host_partition, depth) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(job_id, url, priority, host_partition(url, self.partitions), depth)
+                 for url, priority, depth in items])
+
+    def done(self, job_id: int, urls: List[str]):
+        if not urls:
+            return
+        with self._transaction():
+            self.conn.executemany(
+                "INSERT INTO crawl_frontier (session_id, url, state, host_partition) VALUES (?, ?, 'done', ?) "
+                "ON CONFLICT(session_id, url) DO UPDATE SET state = 'done', worker_id = NULL, lease_until = NULL",
+                [(job_id, url, host_partition(url, self.partitions)) for url in urls])
+
+    def lease(self, job_id: int, worker_id: str, count: int, workers: int = 1,
+              lease_seconds: float = DEFAULT_LEASE_SECONDS) -> List[Tuple[str, int, int]]:
+        now = time.time()
+        until = now + lease_seconds
+        with self._transaction():
+            conn = self.conn
+            # 1. 回收过期的租约
+            conn.execute("UPDATE crawl_frontier SET state = 'queued', worker_id = NULL, lease_until = NULL "
+                         "WHERE session_id = ? AND state = 'leased' AND lease_until < ?", (job_id, now))
+            conn.execute('DELETE FROM crawl_partitions WHERE session_id = ? AND lease_until < ?', (job_id, now))
+
+            # 2. 续约，释放已没有未完成URL的分区（其中的站点此时没有请求在途）
+            conn.execute('UPDATE crawl_partitions SET lease_until = ? WHERE session_id = ? AND worker_id = ?',
+                         (until, job_id, worker_id))
+            conn.execute("UPDATE crawl_frontier SET lease_until = ? "
+                         "WHERE session_id = ? AND state = 'leased' AND worker_id = ?",
+                         (until, job_id, worker_id))
+            active = {row[0] for row in conn.execute(
+                "SELECT DISTINCT host_partition FROM crawl_frontier WHERE session_id = ? AND state != 'done'",
+                (job_id,))}
+            owned = {row[0] for row in conn.execute(
+                'SELECT partition FROM crawl_partitions WHERE session_id = ? AND worker_id = ?',
+                (job_id, worker_id))}
+            idle = owned - active
+            conn.executemany('DELETE FROM crawl_partitions WHERE session_id = ? AND partition = ?',
+                             [(job_id, partition) for partition in idle])
+            owned -= idle
+
+            # 3. 领取一个有待爬取URL的空闲分区
+            if count and len(owned) < math.ceil(len(active) / max(1, workers)):
+                row = conn.execute(
+                    "SELECT host_partition FROM crawl_frontier "
+                    "WHERE session_id = ? AND state = 'queued' AND host_partition NOT IN "
+                    "(SELECT partition FROM crawl_partitions WHERE session_id = ?) "
+                    "ORDER BY priority DESC LIMIT 1", (job_id, job_id)).fetchone()
+                if row:
+                    conn.execute('INSERT INTO crawl_partitions (session_id, partition, worker_id, lease_until) '
+                                 'VALUES (?, ?, ?, ?)', (job_id, row[0], worker_id, until))
+                    owned.add(row[0])
+
+            # 4. 从自己的分区领取URL
+            if not count or not owned:
+                return []
+            placeholders = ','.join('?' * len(owned))
+            rows = conn.execute(
+                f"SELECT url, priority, COALESCE(depth, 0) FROM crawl_frontier "
+                f"WHERE session_id = ? AND state = 'queued' "
+                f"AND host_partition IN ({placeholders}) ORDER BY priority DESC LIMIT ?",
+                (job_id, *owned, count)).fetchall()
+            conn.executemany("UPDATE crawl_frontier SET state = 'leased', worker_id = ?, lease_until = ? "
+                             "WHERE session_id = ? AND url = ?",
+                             [(worker_id, until, job_id, url) for url, _, _ in rows])
+            return rows
+
+    def release(self, job_id: int, worker_id: str):
+        with self._transaction():
+            self.conn.execute("UPDATE crawl_frontier SET state = 'queued', worker_id = NULL, lease_until = NULL "
+                              "WHERE session_id = ? AND state = 'leased' AND worker_id = ?", (job_id, worker_id))
+            self.conn.execute('DELETE FROM crawl_partitions WHERE session_id = ? AND worker_id = ?',
+                              (job_id, worker_id))
+
+    def counts(self, job_id: int) -> Dict[str, int]:
+        with self._lock:
+            counts = dict.fromkeys(('queued', 'leased', 'done'), 0)
+            counts.update(self.conn.execute(
+                'SELECT state, COUNT(*) FROM crawl_frontier WHERE session_id = ? GROUP BY state',
+                (job_id,)).fetchall())
+            return counts
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class MemoryWorkQueue(WorkQueue):
+    """进程内的共享队列，语义与 SqliteWorkQueue 相同
+
+    用于在同一进程的多个线程中运行多个引擎，或在没有共享数据库时验证调度逻辑。
+
+    属性:
+        partitions: 分区数
+    """
+
+    def __init__(self, partitions: int = DEFAULT_PARTITIONS):
+        self.partitions = partitions
+        self._lock = threading.Lock()
+        # 任务ID -> URL -> [优先级, 状态, 分区, worker, 租约到期时间, 链接深度]
+        self._urls: Dict[int, Dict[str, list]] = {}
+        # 任务ID -> 分区 -> [worker, 租约到期时间]
+        self._owners: Dict[int, Dict[int, list]] = {}
+
+    def add(self, job_id: int, items: List[Tuple[str, int, int]]):
+        with self._lock:
+            urls = self._urls.setdefault(job_id, {})
+            for url, priority, depth in items:
+                if url not in urls:
+                    urls[url] = [priority, 'queued', host_partition(url, self.partitions), None, None, depth]
+
+    def done(self, job_id: int, urls: List[str]):
+        with self._lock:
+            entries = self._urls.setdefault(job_id, {})
+            for url in urls:
+                entry = entries.setdefault(url, [0, 'done', host_partition(url, self.partitions), None, None, 0])
+                entry[1], entry[3], entry[4] = 'done', None, None
+
+    def lease(self, job_id: int, worker_id: str, count: int, workers: int = 1,
+              lease_seconds: float = DEFAULT_LEASE_SECONDS) -> List[Tuple[str, int, int]]:
+        now = time.time()
+        until = now + lease_seconds
+        with self._lock:
+            urls = self._urls.setdefault(job_id, {})
+            owners = self._owners.setdefault(job_id, {})
+            active: Set[int] = set()
+            queued: Set[int] = set()
+            for entry in urls.values():
+                if entry[1] == 'leased' and entry[4] < now:
+                    entry[1], entry[3], entry[4] = 'queued', None, None
+                if entry[1] == 'leased' and entry[3] == worker_id:
+                    entry[4] = until
+                if entry[1] != 'done':
+                    active.add(entry[2])
+                if entry[1] == 'queued':
+                    queued.add(entry[2])
+            for partition, (owner, expires) in list(owners.items()):
+                if expires < now or (owner == worker_id and partition not in active):
+                    del owners[partition]
+                elif owner == worker_id:
+                    owners[partition][1] = until
+            owned = {partition for partition, (owner, _) in owners.items() if owner == worker_id}
+            free = sorted(queued - set(owners))
+            if count and free and len(owned) < math.ceil(len(active) / max(1, workers)):
+                owners[free[0]] = [worker_id, until]
+                owned.add(free[0])
+
+            candidates = sorted(((entry[0], url) for url, entry in urls.items()
+                                 if entry[1] == 'queued' and entry[2] in owned), reverse=True)[:count]
+            for _, url in candidates:
+                urls[url][1], urls[url][3], urls[url][4] = 'leased', worker_id, until
+            return [(url, priority, urls[url][5]) for priority, url in candidates]
+
+    def release(self, job_id: int, worker_id: str):
+        with self._lock:
+            for entry in self._urls.get(job_id, {}).values():
+                if entry[1] == 'leased' and entry[3] == worker_id:
+                    entry[1], entry[3], entry[4] = 'queued', None, None
+            owners = self._owners.get(job_id, {})
+            for partition in [p for p, (owner, _) in owners.items() if owner == worker_id]:
+                del owners[partition]
+
+    def counts(self, job_id: int) -> Dict[str, int]:
+        with self._lock:
+            counts = dict.fromkeys(('queued', 'leased', 'done'), 0)
+            for entry in self._urls.get(job_id, {}).values():
+                counts[entry[1]] += 1
+            return counts
+
+
+class WorkerSession:
+    """worker 一侧的共享队列会话
+
+    接口与 CrawlSession 相同（add / done / flush / close），引擎无需区分：
+    新发现的URL和已完成的URL先缓冲，再批量写入共享队列；
+    fill 在本地队列不足时从共享队列领取一批URL，并定期续约。
+
+    属性:
+        queue: 共享队列后端
+        session_id: 任务ID
+        worker_id: worker 标识
+        workers: worker 总数
+        batch_size: 每次领取的URL数，也是缓冲区的批量提交阈值
+        lease_seconds: 租约时长（秒）
+        persist: 提交已完成URL前调用，先把这些页面写入数据库
+        resumed: 恒为True，任务的检查点由协调者维护
+    """
+
+    def __init__(self, queue: WorkQueue, session_id: int, worker_id: str, workers: int = 1,
+                 batch_size: int = 100, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 flush_interval: float = 1.0):
+        self.queue = queue
+        self.session_id = session_id
+        self.worker_id = worker_id
+        self.workers = workers
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.flush_interval = flush_interval
+        self.persist: Optional[Callable[[], None]] = None
+        self.resumed = True
+        self.leased_count = 0
+        self._lock = threading.Lock()
+        self._added: Dict[str, Tuple[int, int]] = {}  # URL -> (优先级, 链接深度)
+        self._done: List[str] = []
+        self._last_flush = time.monotonic()
+        self._last_lease = 0.0
+        self._pending: Optional[int] = None
+        self._pending_checked = 0.0
+
+    def add(self, url: str, priority: int, depth: int = 0):
+        """记录新入队的URL；链接深度随URL写入共享队列，领取它的worker据此检查 max_depth"""
+        with self._lock:
+            self._added[url] = (priority, depth)
+        self._maybe_flush()
+
+    def done(self, url: str):
+        with self._lock:
+            self._done.append(url)
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if (len(self._added) + len(self._done) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """把缓冲的新URL和已完成URL写入共享队列"""
+        with self._lock:
+            added, self._added = self._added, {}
+            done, self._done = self._done, []
+            self._last_flush = time.monotonic()
+        if done and self.persist:
+            self.persist()
+        self.queue.add(self.session_id, [(url, priority, depth) for url, (priority, depth) in added.items()])
+        self.queue.done(self.session_id, done)
+
+    def fill(self, local_size: int) -> List[Tuple[str, int, int]]:
+        """按需从共享队列领取URL
+
+        本地队列少于半批时领取补足一批；否则只在租约过去三分之一时续约。
+        两次访问共享队列至少间隔 0.2 秒。
+
+        Args:
+            local_size: 本地队列中的URL数
+
+        Returns:
+            List: 新领取的 (URL, 优先级, 链接深度)
+        """
+        now = time.monotonic()
+        if now - self._last_lease < 0.2:
+            return []
+        need = self.batch_size - local_size if local_size < self.batch_size // 2 else 0
+        if not need and now - self._last_lease < self.lease_seconds / 3:
+            return []
+        self._last_lease = now
+        self.flush()
+        leased = self.queue.lease(self.session_id, self.worker_id, need, self.workers, self.lease_seconds)
+        self.leased_count += len(leased)
+        return leased
+
+    def has_pending(self) -> bool:
+        """共享队列中是否还有未完成的URL（结果缓存 1 秒）"""
+        now = time.monotonic()
+        if self._pending is None or now - self._pending_checked >= 1.0:
+            self.flush()
+            self._pending = self.queue.pending(self.session_id)
+            self._pending_checked = now
+        return self._pending > 0
+
+    def load(self) -> Tuple[List[Tuple[str, int]], Set[str]]:
+        return [], set()
+
+    def close(self, status: str):
+        """提交缓冲区，把本worker未完成的URL退回共享队列"""
+        self.flush()
+        self.queue.release(self.session_id, self.worker_id)
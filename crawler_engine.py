@@ -0,0 +1,863 @@
+import os
+import threading
+import time
+from collections import deque
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+from crawler_storage import ArticleCache, ArticleStore
+from crawler_politeness import HostScheduler
+from crawler_frontier import Frontier, is_navigation_page, normalize_url, url_priority
+from crawler_state import CrawlSession, CrawlStateStore
+from crawler_freshness import FreshnessPolicy
+from crawler_transport import HttpTransport, FetchResult
+from crawler_extract import ArticleExtractor, extract_page, init_extract_worker
+from crawler_export import create_exporter
+from crawler_discovery import RobotsRules, SiteDiscovery, discovered_priority, site_root
+from crawler_filters import UrlFilter
+from crawler_profiling import Profiler, SamplingProfiler
+from crawler_distributed import WorkQueue, WorkerSession
+
+
+class CrawlEngine:
+    """与界面无关的爬虫引擎
+
+    爬取、存储和搜索都在本类中完成，不依赖 tkinter，可以在没有显示器的
+    服务器上运行（见 crawler_cli）。界面通过回调接收爬取过程中的事件，
+    回调都在调用 crawl() 的线程中触发：
+    - on_progress(text): 进度文字
+    - on_article(article_data): 成功爬取（或从缓存取得）一篇文章
+    - on_error(url, error): 爬取某个页面出错
+    - on_stats(): 已缓存文章的统计数据发生变化
+    - on_complete(finished): 爬取结束，finished 为True表示队列已爬空
+
+    属性:
+        is_crawling: 爬虫运行状态标志，置为False即请求停止
+        crawled_urls: 已爬取URL集合
+        crawled_count: 已爬取文章计数
+        max_articles: 最大爬取文章数限制
+        max_workers: 同时在途的页面请求数
+        host_rate: 每个站点每秒请求数
+        extract_workers: 解析进程数，0 表示在下载线程中解析
+        resume_crawl: 有未完成的检查点时从中断处继续
+        revalidate: 增量更新：过期缓存用 ETag/Last-Modified 向服务器校验
+        discover: 爬取前从站点地图和订阅批量发现文章（见 crawler_discovery）
+        respect_robots: 遵守 robots.txt 的 Disallow 规则
+        robots: 站点根地址 -> robots.txt 规则
+        lastmod: 站点地图或订阅给出的页面修改时间
+        url_filter: 入队前的URL过滤规则（见 crawler_filters）
+        url_depth: 队列中URL与起始页的链接距离
+        profiler: 各阶段（下载、解析、保存等）的耗时统计（见 crawler_profiling）
+        trace_path: 设置后每次爬取结束时把各阶段的起止时间导出为 Chrome trace 文件
+        sample_path: 设置后爬取期间运行采样分析器，结束时导出为 speedscope 文件
+        shared: 作为分布式爬取的 worker 运行时的共享队列会话（见 crawler_distributed）
+        exporter: 文章导出器（见 crawler_export），None 表示不导出
+        articles_cache: 按需加载的文章缓存（见 ArticleCache）
+    """
+
+    def __init__(self, db_path: str = 'crawler_data.db', cache_dir: str = 'cache',
+                 max_workers: int = 5, host_rate: float = 2.0,
+                 extract_workers: Optional[int] = None,
+                 export_format: str = 'segments', export_options: Optional[Dict] = None,
+                 on_progress: Optional[Callable[[str], None]] = None,
+                 on_article: Optional[Callable[[Dict], None]] = None,
+                 on_error: Optional[Callable[[str, Exception], None]] = None,
+                 on_stats: Optional[Callable[[], None]] = None,
+                 on_complete: Optional[Callable[[bool], None]] = None):
+        """打开文章存储并初始化爬虫组件
+
+        Args:
+            db_path: 文章和爬取状态所在的数据库文件
+            cache_dir: 旧版缓存及txt文章所在目录
+            max_workers: 同时在途的页面请求数
+            host_rate: 每个站点每秒请求数
+            extract_workers: 解析进程数，默认等于CPU核数
+            export_format: 文章导出格式，'segments'（压缩段文件，写入 cache_dir/segments）、
+                'txt'（每篇一个文件，写入 cache_dir/articles）或 'none'
+            export_options: 传给 SegmentExporter 的参数（codec、shards 等）
+            on_progress / on_article / on_error / on_stats / on_complete: 事件回调
+        """
+        self.on_progress = on_progress
+        self.on_article = on_article
+        self.on_error = on_error
+        self.on_stats = on_stats
+        self.on_complete = on_complete
+
+        # 爬虫状态
+        self.is_crawling = False
+        self.crawled_urls = set()
+        self.crawled_count = 0
+        self.frontier = Frontier()
+        self.max_articles = float('inf')  # 移除爬取数量限制
+        self.max_workers = max_workers
+        self.host_rate = host_rate
+        self.host_scheduler = HostScheduler(rate=self.host_rate)
+        self.transport = HttpTransport(pool_maxsize=self.max_workers)
+        self.extractor = ArticleExtractor('auto')  # 优先lxml，失败时回退BeautifulSoup
+        self.extract_workers = (os.cpu_count() or 1) if extract_workers is None else extract_workers
+        self.cache_lock = threading.RLock()
+        self.duplicate_count = 0  # 本次爬取中正文与已有文章重复或近似的页面数
+
+        # 缓存相关
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.store = ArticleStore(db_path)
+        self.state_store = CrawlStateStore(db_path)
+        self.session = None
+        self.resume_crawl = True  # 有未完成的检查点时从中断处继续
+        self.revalidate = False  # 增量更新：过期缓存用 ETag/Last-Modified 向服务器校验
+        self.discover = True  # 爬取前从站点地图和订阅批量发现文章
+        self.respect_robots = True  # 遵守 robots.txt 的 Disallow 规则
+        self.robots: Dict[str, RobotsRules] = {}
+        self.lastmod: Dict[str, datetime] = {}
+        self.discovered_count = 0  # 本次爬取从站点地图和订阅中发现的URL数
+        self.robots_blocked = 0  # 本次爬取因 robots.txt 规则丢弃的URL数
+        self.url_filter = UrlFilter()
+        self.url_depth: Dict[str, int] = {}
+        self.profiler = Profiler()
+        self.trace_path: Optional[str] = None
+        self.sample_path: Optional[str] = None
+        self.shared: Optional[WorkerSession] = None
+        self.exporter = create_exporter(
+            export_format,
+            os.path.join(self.cache_dir, 'articles' if export_format == 'txt' else 'segments'),
+            **(export_options or {}))
+        self.freshness = FreshnessPolicy()
+        self.articles_cache = self.load_cache()
+
+    def configure(self, max_workers: Optional[int] = None, host_rate: Optional[float] = None):
+        """调整并发数和站点速率，在每次爬取开始前调用
+
+        连接池大小跟随并发数；每次爬取使用新的站点调度器，清除上次的退避状态。
+        """
+        if max_workers is not None:
+            self.max_workers = max(1, max_workers)
+        if host_rate is not None:
+            self.host_rate = max(0.1, host_rate)
+        if self.transport.pool_maxsize != self.max_workers:
+            self.transport.close()
+            self.transport = HttpTransport(pool_maxsize=self.max_workers)
+        self.host_scheduler = HostScheduler(rate=self.host_rate, burst=max(1, self.host_rate * 2),
+                                            max_per_host=self.max_workers)
+
+    def stop(self):
+        """请求停止爬取，正在进行的请求完成后 crawl() 返回"""
+        self.is_crawling = False
+
+    def _emit(self, callback: Optional[Callable], *args):
+        if callback is not None:
+            callback(*args)
+
+    def fetch_page(self, url: str) -> Dict:
+        """爬取指定URL的页面内容
+
+        该方法负责:
+        1. 检查URL是否已在缓存中且仍在新鲜期内
+        2. 发送HTTP请求获取页面内容（缓存过期时发送条件请求）
+        3. 服务器返回304时直接沿用缓存，否则解析页面提取所需信息（见 ArticleExtractor）
+        4. 保存文章到缓存和导出文件
+
+        下载与解析都在调用线程中完成；并发爬取时 crawl 会把这两步
+        拆开，解析交给进程池（见 download_page 和 store_page）。
+
+        Args:
+            url: 要爬取的网页URL
+
+        Returns:
+            Dict: 包含页面信息的字典，包括标题、发布时间、内容等
+            None: 如果爬取失败
+        """
+        article_data, response = self.download_page(url)
+        if response is None:
+            return article_data
+        try:
+            # 解析页面，提取标题、发布时间、正文和同域名链接
+            with self.profiler.stage('parse'):
+                article_data = self.extractor.extract(url, response.text)
+        except Exception as e:
+            self.report_error(url, e)
+            return None
+        return self.store_page(url, article_data, response)
+
+    def download_page(self, url: str) -> Tuple[Optional[Dict], Optional[FetchResult]]:
+        """下载阶段：检查缓存并发送请求，不解析页面
+
+        Args:
+            url: 要爬取的网页URL
+
+        Returns:
+            Tuple: (文章数据, 待解析的响应)
+                缓存命中或服务器返回304时为 (缓存的文章, None)；
+                需要解析时为 (None, 响应)；失败时为 (None, None)
+        """
+        # 首先检查缓存中是否已存在该文章（只读取元数据，正文按需加载）
+        cached = self.articles_cache.meta(url)
+        if cached and self.is_cache_fresh(url):
+            print(f'从缓存中获取文章: {url}')
+            return self.articles_cache.get(url), None
+
+        try:
+            # 发送HTTP请求获取页面内容，并把结果反馈给站点调度器
+            host = urlparse(url).netloc
+            headers = self.freshness.conditional_headers(cached) if cached else {}
+            request_start = time.monotonic()
+            try:
+                with self.profiler.stage('fetch'):
+                    response = self.transport.get(url, headers=headers,
+                                                  accept_type=self.url_filter.accepts_content_type)
+            except requests.RequestException:
+                self.host_scheduler.record_response(url, host, None, time.monotonic() - request_start)
+                raise
+            self.host_scheduler.record_response(url, host, response.status_code,
+                                                time.monotonic() - request_start,
+                                                response.headers.get('Retry-After'))
+            if response.status_code == 304 and cached:
+                # 页面未修改：跳过下载和解析，只刷新校验时间
+                print(f'页面未修改，沿用缓存: {url}')
+                article_data = dict(self.articles_cache.get(url),
+                                    crawl_time=datetime.now().isoformat(),
+                                    etag=response.headers.get('ETag', cached.get('etag')),
+                                    last_modified=response.headers.get('Last-Modified',
+                                                                       cached.get('last_modified')))
+                self.save_to_cache(url, article_data)
+                return article_data, None
+            if response.rejected_type:
+                # 图片、附件等非网页资源：只读取了响应头，不下载也不解析
+                self.url_filter.reject_content_type()
+                print(f'Content-Type 为 {response.headers.get("Content-Type")}，已跳过: {url}')
+                return None, None
+            if response.truncated:
+                print(f'页面超过 {self.transport.max_body_size} 字节，已跳过: {url}')
+                return None, None
+            if response.status_code == 200:
+                return None, response
+        except Exception as e:
+            self.report_error(url, e)
+        return None, None
+
+    def store_page(self, url: str, article_data: Dict, response: FetchResult) -> Dict:
+        """保存阶段：补充抓取信息并保存到缓存和本地文件
+
+        Args:
+            url: 页面URL
+            article_data: 提取出的文章数据
+            response: 页面的响应
+
+        Returns:
+            Dict: 补充了抓取时间和HTTP校验信息的文章数据
+        """
+        # 记录抓取时间及服务器返回的校验信息，供增量更新时发送条件请求
+        article_data['crawl_time'] = datetime.now().isoformat()
+        article_data['etag'] = response.headers.get('ETag')
+        article_data['last_modified'] = response.headers.get('Last-Modified')
+
+        # 正文与已保存文章完全相同时只记录原始URL，正文不再重复保存；
+        # 近似时保留自己的正文，只记录相似文章的URL（similar_url）。
+        # 只对内容页去重：首页、归档页等导航页的正文是当前排在最前的文章，
+        # 会随更新变化，既不能作为原始文章，也不应被当作重复页面
+        if is_navigation_page(url):
+            article_data['content_hash'] = article_data['simhash'] = None
+        # 查找与保存在同一把锁内完成，避免两个相同页面都被当作原始文章
+        with self.cache_lock:
+            with self.profiler.stage('dedup'):
+                duplicate, exact = self.store.find_duplicate(url, article_data.get('content_hash'),
+                                                             article_data.get('simhash'))
+            article_data['canonical_url'] = duplicate if exact else None
+            article_data['similar_url'] = None if exact else duplicate
+            self.save_to_cache(url, article_data)
+        if duplicate:
+            self.duplicate_count += 1
+            print(f'正文与 {duplicate} {"重复" if exact else "近似"}: {url}')
+        if not exact and self.exporter:
+            with self.profiler.stage('export'):
+                self.exporter.write(article_data)
+        return article_data
+
+    def fetch_resource(self, url: str) -> Optional[bytes]:
+        """按站点限速下载 robots.txt、站点地图等非文章资源
+
+        与页面请求共用站点调度器：等待站点令牌，并把响应反馈给调度器。
+
+        Args:
+            url: 资源URL
+
+        Returns:
+            bytes: 响应体；失败、被停止或状态码不是200时为None
+        """
+        host = urlparse(url).netloc
+        while not self.host_scheduler.try_acquire(host):
+            if not self.is_crawling:
+                return None
+            time.sleep(max(self.host_scheduler.wait_time(host), 0.01))
+        request_start = time.monotonic()
+        try:
+            response = self.transport.get(url)
+        except requests.RequestException as e:
+            self.host_scheduler.record_response(url, host, None, time.monotonic() - request_start)
+            print(f'读取 {url} 出错: {str(e)}')
+            return None
+        finally:
+            self.host_scheduler.release(host)
+        self.host_scheduler.record_response(url, host, response.status_code,
+                                            time.monotonic() - request_start,
+                                            response.headers.get('Retry-After'))
+        if response.status_code != 200 or response.truncated:
+            return None
+        return response.content
+
+    def discover_urls(self, seeds: List[str], resumed: bool = False):
+        """发现阶段：读取起始站点的 robots.txt、站点地图和订阅
+
+        该方法负责:
+        1. 读取每个起始站点的 robots.txt，之后入队的URL按其 Disallow 规则过滤
+        2. 从站点地图（或 Blogspot 订阅）批量发现文章，连同修改时间一起
+           以高于普通链接的优先级加入队列，按修改时间从新到旧排列；
+           这些URL的链接深度记为 1，同样经过 url_filter 过滤
+        3. 从检查点恢复时队列中已有发现的URL，只读取 robots.txt
+
+        Args:
+            seeds: 起始URL列表
+            resumed: 是否从检查点恢复
+        """
+        if not self.discover and not self.respect_robots:
+            return
+        discovery = SiteDiscovery(self.fetch_resource, is_running=lambda: self.is_crawling)
+        for site in dict.fromkeys(site_root(normalize_url(url)) for url in seeds):
+            if not self.is_crawling:
+                break
+            robots = discovery.robots(site)
+            if self.respect_robots:
+                self.robots[site] = robots
+            if not self.discover or resumed:
+                continue
+            self._emit(self.on_progress, f'正在读取站点地图和订阅: {site}')
+            found, counts = discovery.discover(site, robots)
+            self.enqueue_discovered(found, site)
+            self._emit(self.on_progress,
+                       f'{site}: 站点地图 {counts["sitemap"]} 个、订阅 {counts["feed"]} 个页面，'
+                       f'共 {discovery.requests} 次请求')
+
+    def enqueue_discovered(self, found: Dict[str, Optional[datetime]], site: str):
+        """把站点地图和订阅中的URL批量加入队列
+
+        与页面中的链接一样只保留起始站点的URL：robots.txt 的 Sitemap 行或订阅的
+        alternate 链接可能指向其他域名。修改时间记录在 lastmod 中（见 is_cache_fresh）；
+        最近修改的页面先入队，相同优先级时先出队。
+
+        Args:
+            found: URL -> 修改时间（未知时为None）
+            site: 起始站点的根地址（见 site_root）
+        """
+        host = urlparse(site).netloc
+        latest = {}
+        for url, modified in found.items():
+            url = normalize_url(url)
+            if urlparse(url).netloc != host:
+                continue
+            if modified is not None:
+                self.lastmod[url] = modified
+            if url not in latest or (modified and (latest[url] is None or modified > latest[url])):
+                latest[url] = modified
+        candidates = [url for url in latest if url not in self.frontier.enqueued
+                      and self.is_allowed(url) and self.in_scope(url, 1)]
+        candidates.sort(key=lambda url: latest[url] or datetime.min, reverse=True)
+        stored = self.store.get_priorities(candidates)
+        for url in candidates:
+            self._push(url, max(discovered_priority(url), stored.get(url, 0)), 1)
+        self.discovered_count += len(candidates)
+
+    def is_allowed(self, url: str) -> bool:
+        """robots.txt 是否允许抓取该URL（未读取过规则的站点不限制）"""
+        robots = self.robots.get(site_root(url))
+        if robots is None or robots.allowed(url):
+            return True
+        self.robots_blocked += 1
+        self.frontier.mark_seen(url)
+        return False
+
+    def in_scope(self, url: str, depth: int) -> bool:
+        """URL是否通过 url_filter 的规则
+
+        起始URL（深度 0）由用户指定，不过滤。被拒绝的URL记入队列的去重集合，
+        之后再出现时直接丢弃，每条规则的计数即为省下的请求数；
+        只有超过最大深度的URL例外，它可能稍后从更浅的页面再次被发现。
+
+        Args:
+            url: 规范化后的URL
+            depth: 与起始页的链接距离
+        """
+        if depth == 0:
+            return True
+        rule = self.url_filter.check(url, depth)
+        if rule is None:
+            return True
+        if rule != 'depth':
+            self.frontier.mark_seen(url)
+        return False
+
+    def report_error(self, url: str, error: Exception):
+        """通知爬取错误（未设置回调时打印到控制台）"""
+        if self.on_error is not None:
+            self.on_error(url, error)
+        else:
+            print(f'爬取 {url} 时出错: {str(error)}')
+
+    def crawl(self, seeds: List[str], shared: Optional[WorkerSession] = None) -> bool:
+        """爬取网站内容的核心方法
+
+        该方法实现网站爬取的主要逻辑：
+        1. 初始化按站点分组的优先级队列（入队时规范化并去重），清零各阶段计时
+        2. 打开或恢复持久化的爬取会话（队列与已完成集合）；作为分布式爬取的
+           worker 时改为使用共享队列会话，本地队列按需从共享队列领取URL
+        3. 发现阶段：读取 robots.txt，从站点地图和订阅批量发现文章（见 discover_urls）；
+           之后每个URL入队前都要经过 robots.txt 和 url_filter 的检查
+        4. 下载阶段：线程池保持 max_workers 个页面请求同时在途，按站点令牌桶限速
+        5. 解析阶段：下载好的页面交给进程池解析，待解析页面超过上限时暂停下载（背压）
+        6. 每解析完一个页面，立即将新发现的链接加入队列，被限流的URL稍后重试
+        7. 通知进度
+        8. 处理爬取结果，结束时记录会话状态并输出各阶段耗时（见 dump_profile）
+
+        Args:
+            seeds: 起始URL列表
+            shared: 分布式爬取的共享队列会话（见 open_shared_job），None 表示单机爬取
+
+        Returns:
+            bool: 队列（分布式爬取时为共享队列）已爬空时返回True，被停止时返回False
+        """
+        if isinstance(seeds, str):
+            seeds = [seeds]
+        self.is_crawling = True
+        self.shared = shared
+        self.crawled_urls.clear()
+        self.crawled_count = 0
+        self.duplicate_count = 0
+        self.discovered_count = 0
+        self.robots_blocked = 0
+        self.robots.clear()
+        self.lastmod.clear()
+        self.url_filter.reset()
+        self.url_depth.clear()
+        self.profiler.reset(trace=bool(self.trace_path))
+        sampler = SamplingProfiler() if self.sample_path else None
+        if sampler:
+            sampler.start()
+
+        # 按站点分组的优先级队列，空闲名额只分配给当前有令牌的站点
+        self.frontier = Frontier()
+
+        if shared is not None:
+            # 分布式 worker：起始URL和发现阶段的结果已由协调者写入共享队列，
+            # 这里只读取 robots.txt。已完成的URL写入共享队列前先提交文章缓冲区，
+            # worker 崩溃时不会出现队列中已完成、数据库中却没有的页面
+            self.session = shared
+            shared.persist = self.store.flush
+            self.discover_urls(seeds, resumed=True)
+        else:
+            # 打开持久化的爬取会话，有未完成的检查点时从中断处继续；
+            # 多个起始URL共用一个会话，以排序后的起始URL作为会话标识
+            self.session = self.state_store.open_session(self.session_seed(seeds),
+                                                         resume=self.resume_crawl)
+            self.session.persist = self.store.flush
+            if self.session.resumed:
+                queued, done = self.session.load()
+                self.crawled_urls.update(done)
+                self.crawled_count = len(done)
+                self.frontier.enqueued.update(done)
+                for url, priority in queued:
+                    self.frontier.push(url, priority)
+                self._emit(self.on_progress,
+                           f'从上次中断处继续: 已完成 {len(done)} 个，待爬取 {len(queued)} 个')
+            self.discover_urls(seeds, resumed=self.session.resumed)
+            self.enqueue_urls(seeds)
+
+        # 下载中的请求: future -> (url, 占用配额的站点)
+        downloads = {}
+        # 已下载待解析的页面 (url, 响应)，以及解析中的页面: future -> (url, 响应)
+        parse_backlog = deque()
+        extractions = {}
+        # 解析阶段的并行度与积压上限
+        parse_slots = self.extract_workers * 2
+        backlog_limit = max(self.max_workers, parse_slots)
+
+        # 未启用进程池时，下载线程直接完成解析（与 fetch_page 相同）
+        extract_pool = self.create_extract_pool() if self.extract_workers else None
+        # 因解析进程异常退出而重新解析过的页面，再次失败时不再重试
+        reparsed = set()
+        fetch = self.download_page if extract_pool else self.fetch_page
+
+        # 出错时同样提交缓冲区、记录会话状态并通知界面，异常随后继续抛出
+        finished = False
+        try:
+            # 使用线程池并发下载
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while self.is_crawling and (self.frontier or downloads or extractions or parse_backlog
+                                            or self.has_shared_work()):
+                    # 分布式爬取：本地队列不足时从共享队列领取一批URL，并为租约续约
+                    if shared is not None:
+                        for url, priority, depth in shared.fill(len(self.frontier)):
+                            self.frontier.push(url, priority, force=True)
+                            self.url_depth[url] = depth
+
+                    # 解析阶段：把积压的页面提交给进程池
+                    while parse_backlog and len(extractions) < parse_slots:
+                        current_url, response = parse_backlog.popleft()
+                        args = (extract_page, current_url, response.content, response.encoding,
+                                self.extractor.engine)
+                        try:
+                            future = extract_pool.submit(*args)
+                        except BrokenProcessPool:
+                            # 有解析进程异常退出（如被系统杀掉），整个进程池不再可用，换一个新的
+                            extract_pool.shutdown(wait=False, cancel_futures=True)
+                            extract_pool = self.create_extract_pool()
+                            future = extract_pool.submit(*args)
+                        extractions[future] = (current_url, response)
+
+                    # 下载阶段：补充任务，直到在途请求数达到并发上限；
+                    # 解析跟不上时积压队列会变满，此时暂停下载
+                    for host in self.frontier.hosts():
+                        while (len(downloads) < self.max_workers
+                               and len(parse_backlog) < backlog_limit
+                               and self.crawled_count < self.max_articles):
+                            current_url = self.frontier.peek(host)
+                            if current_url is None:
+                                break
+
+                            # 已缓存的页面不发请求，无需占用站点配额；
+                            # 站点暂无令牌时跳过，轮到下一个站点
+                            cached = self.is_cache_fresh(current_url)
+                            if not cached and not self.host_scheduler.try_acquire(host):
+                                break
+                            self.frontier.pop(host)
+
+                            # 标记URL为已爬取
+                            self.crawled_urls.add(current_url)
+
+                            # 通知进度（界面自行决定刷新频率）
+                            self.crawled_count += 1
+                            if self.on_progress is not None:
+                                stats = self.frontier.stats()
+                                self.on_progress(
+                                    f'正在爬取第 {self.crawled_count} 个页面: {current_url}\n'
+                                    f'待爬取 {stats["queued"]} 个 | 已发现 {stats["seen"]} 个 | '
+                                    f'队列内存 {stats["memory_bytes"] // 1024} KB')
+
+                            future = executor.submit(fetch, current_url)
+                            downloads[future] = (current_url, None if cached else host)
+
+                    in_flight = list(downloads) + list(extractions)
+                    if self.crawled_count >= self.max_articles and not in_flight and not parse_backlog:
+                        break
+
+                    # 计算最早可请求站点的等待时间，避免在限速期间空转
+                    timeout = 0.5
+                    if self.frontier:
+                        timeout = min([timeout] + [self.host_scheduler.wait_time(host)
+                                                   for host in self.frontier.hosts()])
+                        timeout = max(timeout, 0.01)
+                    if not in_flight:
+                        with self.profiler.stage('wait'):
+                            time.sleep(timeout)
+                        continue
+
+                    # 等待任意一个下载或解析完成，超时后重新检查停止标志和站点令牌
+                    with self.profiler.stage('wait'):
+                        done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in downloads:
+                            current_url, host = downloads.pop(future)
+                            if host:
+                                self.host_scheduler.release(host)
+                            if extract_pool:
+                                article_data, response = future.result()
+                                if response is not None:
+                                    parse_backlog.append((current_url, response))
+                                    continue
+                            else:
+                                article_data = future.result()
+                        else:
+                            current_url, response = extractions.pop(future)
+                            try:
+                                article_data, engine, elapsed = future.result()
+                            except BrokenProcessPool as e:
+                                # 进程池损坏时在途的页面都会失败，重新解析一次（进程池在提交时重建）
+                                if current_url not in reparsed:
+                                    reparsed.add(current_url)
+                                    parse_backlog.append((current_url, response))
+                                    continue
+                                self.report_error(current_url, e)
+                                article_data = None
+                            except Exception as e:
+                                self.report_error(current_url, e)
+                                article_data = None
+                            else:
+                                self.extractor.record(engine, elapsed)
+                                self.profiler.record('parse', elapsed)
+                                article_data = self.store_page(current_url, article_data, response)
+                        self.on_page_done(current_url, article_data)
+
+                # 停止时取消尚未开始的请求，它们与积压的页面一起以待爬取状态保留在检查点中
+                finished = (not self.frontier and not downloads and not extractions and not parse_backlog
+                            and not self.has_shared_work())
+                for future in list(downloads) + list(extractions):
+                    future.cancel()
+        finally:
+            if extract_pool:
+                extract_pool.shutdown(wait=True, cancel_futures=True)
+            self.is_crawling = False
+            try:
+                # 提交缓冲区中尚未写入数据库和导出文件的文章，以及爬取检查点
+                with self.profiler.stage('persist'):
+                    self.store.flush()
+                if self.exporter:
+                    with self.profiler.stage('export'):
+                        self.exporter.flush()
+            finally:
+                self.session.close('finished' if finished else 'stopped')
+                self.dump_profile(sampler)
+                self._emit(self.on_complete, finished)
+        return finished
+
+    def create_extract_pool(self) -> ProcessPoolExecutor:
+        """创建解析进程池
+
+        使用 spawn 方式启动解析进程：fork 会复制下载线程、界面线程持有的锁
+        （标准输出、SQLite 等），子进程可能因此死锁；解析进程忽略 Ctrl+C，
+        由主进程统一停止（见 init_extract_worker）。
+        """
+        return ProcessPoolExecutor(self.extract_workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=init_extract_worker)
+
+    @staticmethod
+    def session_seed(seeds: List[str]) -> str:
+        """会话标识：规范化并排序后的起始URL，以空格连接"""
+        return ' '.join(sorted({normalize_url(url) for url in seeds}))
+
+    def has_shared_work(self) -> bool:
+        """分布式爬取时共享队列中是否还有其他worker未完成的URL"""
+        return self.shared is not None and self.shared.has_pending()
+
+    def open_shared_job(self, seeds: List[str], queue: WorkQueue) -> CrawlSession:
+        """协调者：打开分布式爬取任务，把起始URL和发现阶段的结果写入共享队列
+
+        任务就是一个爬取会话，会话ID即任务ID，共享队列保存在该会话的检查点中；
+        以相同的起始URL再次打开时，未完成的任务从检查点继续。
+
+        Args:
+            seeds: 起始URL列表
+            queue: 共享队列后端
+
+        Returns:
+            CrawlSession: 任务对应的会话，全部完成后由调用者 close('finished')
+        """
+        job = self.state_store.open_session(self.session_seed(seeds), resume=self.resume_crawl)
+        queue.prepare(job.session_id)
+        self.shared = self.session = WorkerSession(queue, job.session_id, 'coordinator')
+        self.frontier = Frontier()
+        self.robots.clear()
+        self.discovered_count = self.robots_blocked = 0
+        self.is_crawling = True
+        try:
+            self.discover_urls(seeds, resumed=job.resumed)
+            self.enqueue_urls(seeds)
+            self.shared.flush()
+        finally:
+            self.is_crawling = False
+            self.shared = None
+        return job
+
+    def on_page_done(self, url: str, article_data: Optional[Dict]):
+        """处理一个页面的最终结果
+
+        成功时将新发现的链接加入队列并通知界面；
+        被限流或网络失败且仍可重试的URL重新入队，其余情况记为已完成。
+
+        Args:
+            url: 页面URL
+            article_data: 文章数据，失败时为None
+        """
+        retry = not article_data and self.host_scheduler.take_retry(url)
+        if not retry:
+            depth = self.url_depth.pop(url, 0)
+            # 先将新发现的链接加入队列（入队时即完成去重和过滤），再把本页记为已完成，
+            # 避免中途退出后本页已完成而子链接从未入队；正文重复或近似的文章页
+            # （如 ?m=1 等同一文章的不同地址）链接与原文相同，不再展开
+            if (article_data and not article_data.get('canonical_url')
+                    and not article_data.get('similar_url')):
+                with self.profiler.stage('links'):
+                    self.enqueue_urls(article_data['links'], depth + 1)
+            self.session.done(url)
+        if article_data:
+            with self.profiler.stage('dispatch'):
+                self._emit(self.on_article, article_data)
+        elif retry:
+            # 被限流或网络失败的URL稍后重试
+            self.crawled_urls.discard(url)
+            self.crawled_count -= 1
+            self.frontier.push(url, url_priority(url), force=True)
+
+    def dump_profile(self, sampler: Optional[SamplingProfiler] = None):
+        """爬取结束时输出各阶段耗时，并按设置导出 trace 和采样文件
+
+        Args:
+            sampler: 本次爬取运行的采样分析器，未启用时为None
+        """
+        # 先停止采样线程再输出：导出出错也不会让采样线程继续运行，输出本身也不计入采样
+        if sampler:
+            sampler.stop()
+        print('各阶段耗时:\n' + self.profiler.summary())
+        try:
+            if self.trace_path:
+                self.profiler.write_chrome_trace(self.trace_path)
+                print(f'已导出 Chrome trace: {self.trace_path}')
+            if sampler:
+                sampler.write_speedscope(self.sample_path)
+                print('采样最多的函数: ' + ', '.join(f'{name} {count}' for name, count in sampler.top(5)))
+                print(f'已导出 speedscope 采样文件: {self.sample_path}（{sampler.samples} 次采样）')
+        except Exception as e:
+            print(f'导出性能分析文件出错: {str(e)}')
+
+    def is_cache_fresh(self, url: str) -> bool:
+        """判断URL是否可以直接使用缓存而不发请求
+
+        非增量更新模式下，缓存中的文章永远有效；
+        增量更新模式下，超过新鲜期且在站点地图给出的修改时间之前抓取的文章
+        需要向服务器重新校验。
+
+        Args:
+            url: 文章URL
+
+        Returns:
+            bool: 可直接使用缓存时返回True
+        """
+        meta = self.articles_cache.meta(url)
+        if not meta:
+            return False
+        return not self.revalidate or self.freshness.is_fresh(url, meta['crawl_time'],
+                                                              self.lastmod.get(url))
+
+    def enqueue_urls(self, urls: List[str], depth: int = 0):
+        """规范化URL并按优先级加入爬取队列
+
+        优先级取 pages 表 priority 列中记录的值与按URL形态估计值中的较大者，
+        已入过队、被 robots.txt 禁止或不符合 url_filter 规则的URL直接丢弃，
+        新入队的URL同时写入会话检查点。
+
+        Args:
+            urls: 待加入队列的URL列表
+            depth: 这些URL与起始页的链接距离，起始URL为 0
+                （从检查点恢复的URL深度未知，按 0 计）
+        """
+        candidates = {normalize_url(url) for url in urls} - self.frontier.enqueued
+        candidates = {url for url in candidates if self.is_allowed(url) and self.in_scope(url, depth)}
+        if not candidates:
+            return
+        stored = self.store.get_priorities(candidates)
+        for url in candidates:
+            self._push(url, max(url_priority(url), stored.get(url, 0)), depth)
+
+    def _push(self, url: str, priority: int, depth: int):
+        """把通过检查的新URL加入队列并写入会话
+
+        分布式爬取时URL连同链接深度只写入共享队列，由负责该站点分区的worker领取
+        （可能是自己，见 crawl 中的 fill），本地只记入去重集合。
+        """
+        if self.shared is None:
+            self.frontier.push(url, priority)
+            self.url_depth[url] = depth
+            self.session.add(url, priority)
+        else:
+            self.frontier.mark_seen(url)
+            self.shared.add(url, priority, depth)
+
+    def summary(self) -> str:
+        """本次爬取的页面数、请求耗时及解析耗时摘要"""
+        timing = self.transport.timing_stats()
+        parts = [
+            f'请求 {timing["requests"]} 次，新建连接 {timing["new_connections"]} 个',
+            f'平均耗时(ms) DNS {timing["dns"]:.1f} / 连接 {timing["connect"]:.1f} / '
+            f'TLS {timing["tls"]:.1f} / 首字节 {timing["ttfb"]:.1f} / 下载 {timing["download"]:.1f}',
+        ]
+        parse_stats = [f'{engine} 解析 {stats["pages"]} 页 平均 {stats["avg_ms"]:.1f} ms'
+                       for engine, stats in self.extractor.stats().items() if stats['pages']]
+        if parse_stats:
+            parts.append(' / '.join(parse_stats))
+        if self.url_filter.rejected:
+            parts.append('过滤规则省下的请求: ' + self.url_filter.summary())
+        stage_status = self.profiler.status()
+        if stage_status:
+            parts.append('平均耗时 ' + stage_status)
+        summary = f'爬取结束，共爬取 {self.crawled_count} 个页面'
+        if self.duplicate_count:
+            summary += f'（其中 {self.duplicate_count} 个与已有文章重复或近似）'
+        if self.discovered_count:
+            summary += f'，从站点地图和订阅发现 {self.discovered_count} 个'
+        if self.robots_blocked:
+            summary += f'，robots.txt 禁止的链接 {self.robots_blocked} 个'
+        return summary + '\n' + ' | '.join(parts)
+
+    def statistics(self) -> Tuple[int, float]:
+        """已缓存文章的统计数据
+
+        Returns:
+            Tuple: (文章数量, 平均正文长度)
+        """
+        total_articles = len(self.articles_cache)
+        total_length = self.articles_cache.total_content_length
+        return total_articles, total_length / total_articles if total_articles > 0 else 0
+
+    def search(self, keyword: str, limit: int = 200) -> List[Dict]:
+        """在已缓存文章中全文搜索，结果格式见 SearchIndex.search"""
+        return self.store.search(keyword, limit)
+
+    def save_to_cache(self, url: str, article_data: Dict):
+        """将文章保存到缓存
+
+        该方法负责:
+        1. 将文章数据添加到缓存（内存中只保留最近使用的文章）
+        2. 将文章交给存储后端批量持久化（只写入本篇，不重写整个缓存）
+        3. 通知统计数据变化
+
+        Args:
+            url: 文章URL
+            article_data: 文章数据字典
+        """
+        # 写入缓存（可能由多个爬取线程同时调用），由存储后端负责批量提交到SQLite
+        try:
+            with self.cache_lock, self.profiler.stage('persist'):
+                self.articles_cache.put(dict(article_data, url=url))
+        except Exception as e:
+            print(f'保存缓存出错: {str(e)}')
+        self._emit(self.on_stats)
+
+    def load_cache(self) -> ArticleCache:
+        """打开文章缓存
+
+        缓存只在打开时统计文章数量和总长度，文章正文在使用时才从SQLite读取，
+        启动耗时和内存占用与已缓存文章数量无关。旧版 articles.json 缓存文件
+        会在首次加载时一次性迁移到数据库。
+
+        Returns:
+            ArticleCache: 按需加载的文章缓存
+        """
+        try:
+            self.store.migrate_json(os.path.join(self.cache_dir, 'articles.json'))
+        except Exception as e:
+            print(f'加载缓存出错: {str(e)}')
+        return ArticleCache(self.store)
+
+    def close(self):
+        """停止爬取，关闭连接池并提交缓冲区中的文章"""
+        self.is_crawling = False
+        self.transport.close()
+        try:
+            self.store.flush()
+            if self.exporter:
+                self.exporter.close()
+        except Exception as e:
+            print(f'保存缓存出错: {str(e)}')
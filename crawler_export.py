@@ -0,0 +1,235 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # 未安装时只能使用 gzip
+    zstandard = None
+
+
+EXPORT_FORMATS = ('segments', 'txt', 'none')
+CODECS = {'gzip': '.jsonl.gz', 'zstd': '.jsonl.zst'}
+SEGMENT_PATTERN = re.compile(r'^articles-(\d+)-(\d+)\.jsonl\.(gz|zst)$')
+
+# 导出记录包含的字段
+EXPORT_FIELDS = ('url', 'title', 'publish_date', 'crawl_time', 'content', 'links')
+
+
+def url_hash(url: str) -> str:
+    """URL的 SHA-1 十六进制摘要，用于分片和文件命名"""
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+class TxtExporter:
+    """每篇文章一个txt文件
+
+    文件名为 {标题}-{URL哈希前8位}.txt：标题被截断或过滤后相同的不同文章
+    不会互相覆盖，同一URL重新爬取时覆盖自己的文件。
+
+    属性:
+        directory: 输出目录
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def file_name(self, article_data: Dict) -> str:
+        # 移除文件名中不合法的字符
+        title = ''.join(c for c in article_data['title'] if c.isalnum() or c in (' ', '-', '_')).strip()
+        return f"{title or '无标题'}-{url_hash(article_data['url'])[:8]}.txt"
+
+    def write(self, article_data: Dict):
+        file_path = os.path.join(self.directory, self.file_name(article_data))
+        try:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(f"标题: {article_data['title']}\n\n")
+                f.write(f"发布时间: {article_data['publish_date']}\n")
+                f.write(f"原文链接: {article_data['url']}\n\n")
+                f.write("正文内容:\n")
+                f.write(article_data['content'])
+            print(f'文章已保存: {file_path}')
+        except Exception as e:
+            print(f'保存文章出错: {str(e)}')
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SegmentExporter:
+    """按URL哈希分片、批量写入的压缩 JSONL 段文件
+
+    每篇文章是一行 JSON，按 URL 哈希分到 shards 个分片之一。文章先进入缓冲区，
+    达到批量大小或时间间隔后，每个分片的新文章压缩成一个独立的 gzip 成员
+    （或 zstd 帧）追加到该分片当前的段文件 articles-{分片}-{序号}.jsonl.gz 中；
+    段文件超过 segment_size 后开始写下一个序号。
+
+    多个压缩成员拼接仍是合法的 gzip/zstd 文件，可以直接用 zcat / zstdcat 读取，
+    也可以用 iter_segments 读取。段文件只追加，同一URL重新爬取时会写入新记录，
+    读取时以最后一条为准。
+
+    属性:
+        directory: 输出目录
+        shards: 分片数
+        codec: 'gzip' 或 'zstd'
+        batch_size: 累积多少篇文章后写入一次
+        flush_interval: 距上次写入超过该秒数时强制写入
+        segment_size: 段文件大小上限（字节）
+    """
+
+    def __init__(self, directory: str, shards: int = 16, codec: str = 'gzip',
+                 batch_size: int = 200, flush_interval: float = 5.0,
+                 segment_size: int = 64 * 1024 * 1024, level: Optional[int] = None):
+        if codec not in CODECS:
+            raise ValueError(f'不支持的压缩格式: {codec}')
+        if codec == 'zstd' and zstandard is None:
+            raise RuntimeError('未安装 zstandard')
+        self.directory = directory
+        self.shards = shards
+        self.codec = codec
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.segment_size = segment_size
+        self.level = level if level is not None else (6 if codec == 'gzip' else 3)
+
+        self._lock = threading.Lock()
+        self._pending: Dict[int, List[bytes]] = {}
+        self._pending_count = 0
+        self._last_flush = time.monotonic()
+        self._retry_at = 0.0  # 写入失败（如磁盘已满）后，下次自动写入的最早时间
+        os.makedirs(directory, exist_ok=True)
+        self._sequence = self._existing_sequences()
+
+    def _existing_sequences(self) -> Dict[int, int]:
+        """各分片已有的最大段序号，新数据接着写入"""
+        sequence = {}
+        suffix = CODECS[self.codec]
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if match and name.endswith(suffix):
+                shard, number = int(match.group(1)), int(match.group(2))
+                sequence[shard] = max(sequence.get(shard, 0), number)
+        return sequence
+
+    def segment_path(self, shard: int) -> str:
+        number = self._sequence.get(shard, 0)
+        return os.path.join(self.directory, f'articles-{shard:02d}-{number:04d}{CODECS[self.codec]}')
+
+    def write(self, article_data: Dict):
+        """加入一篇文章，必要时批量写入"""
+        record = {field: article_data.get(field) for field in EXPORT_FIELDS}
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        shard = int(url_hash(article_data['url'])[:8], 16) % self.shards
+        with self._lock:
+            self._pending.setdefault(shard, []).append(line)
+            self._pending_count += 1
+            now = time.monotonic()
+            if now >= self._retry_at and (self._pending_count >= self.batch_size or
+                                          now - self._last_flush >= self.flush_interval):
+                self._flush()
+
+    def flush(self):
+        """把缓冲区中的文章写入段文件"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        """逐个分片写入，写入成功的分片才移出缓冲区
+
+        写入出错（如磁盘已满）时输出错误并停止本次写入，爬取继续；
+        未写入的分片留在缓冲区，flush_interval 秒后或爬取结束时重试，已写入的不会重复写入。
+        """
+        self._last_flush = time.monotonic()
+        for shard in list(self._pending):
+            lines = self._pending[shard]
+            try:
+                self._write_shard(shard, b''.join(lines))
+            except Exception as e:
+                print(f'导出文章出错: {str(e)}')
+                self._retry_at = self._last_flush + self.flush_interval
+                return
+            del self._pending[shard]
+            self._pending_count -= len(lines)
+
+    def _write_shard(self, shard: int, data: bytes):
+        data = self._compress(data)
+        path = self.segment_path(shard)
+        if os.path.exists(path) and os.path.getsize(path) + len(data) > self.segment_size:
+            self._sequence[shard] = self._sequence.get(shard, 0) + 1
+            path = self.segment_path(shard)
+        # 一次写入一个完整的压缩成员，中途崩溃最多损坏最后一个成员；
+        # 写入出错时截掉写了一半的成员，重试时段文件中不会夹着损坏的数据
+        with open(path, 'ab') as f:
+            size = f.tell()
+            try:
+                f.write(data)
+                f.flush()
+            except Exception:
+                f.truncate(size)
+                raise
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == 'zstd':
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return gzip.compress(data, compresslevel=self.level)
+
+    def close(self):
+        self.flush()
+
+
+def create_exporter(export_format: str, directory: str, **options):
+    """按格式创建文章导出器
+
+    Args:
+        export_format: 'segments'（压缩段文件）、'txt'（每篇一个文件）或 'none'
+        directory: 输出目录
+        options: 传给 SegmentExporter 的参数（codec、shards 等）
+
+    Returns:
+        导出器；'none' 时返回None
+    """
+    if export_format == 'segments':
+        return SegmentExporter(directory, **options)
+    if export_format == 'txt':
+        return TxtExporter(directory)
+    if export_format == 'none':
+        return None
+    raise ValueError(f'不支持的导出格式: {export_format}')
+
+
+def _open_segment(path: str, codec: str):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('未安装 zstandard')
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True,
+                                                            closefd=True)
+        return io.BufferedReader(reader)
+    return gzip.open(path, 'rb')
+
+
+def iter_segments(directory: str) -> Iterator[Dict]:
+    """依次读取目录中全部段文件里的文章
+
+    段文件末尾不完整的压缩成员（写入时崩溃）会被跳过。
+    """
+    for name in sorted(os.listdir(directory)):
+        match = SEGMENT_PATTERN.match(name)
+        if not match:
+            continue
+        path = os.path.join(directory, name)
+        with _open_segment(path, 'zstd' if match.group(3) == 'zst' else 'gzip') as f:
+            try:
+                for line in f:
+                    yield json.loads(line)
+            except (EOFError, gzip.BadGzipFile, ValueError) as e:
+                print(f'段文件 {path} 末尾不完整，已跳过: {str(e)}')
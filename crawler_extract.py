@@ -0,0 +1,406 @@
+import re
+import signal
+import threading
+import time
+from html.entities import html5 as HTML5_ENTITIES
+from typing import Dict, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+from crawler_dedup import fingerprint
+from crawler_transport import decode_body
+
+try:
+    from lxml import etree
+except ImportError:  # 未安装 lxml 时只能使用 BeautifulSoup
+    etree = None
+
+
+# 与 fetch_page 原有规则一致的标签和类名
+DATE_TAGS = ('time', 'span', 'div')
+DATE_CLASSES = ('date', 'time', 'published', 'post-date')
+CONTENT_TAGS = ('article', 'div')
+CONTENT_CLASSES = ('post-content', 'entry-content', 'article-content')
+# BeautifulSoup 的 get_text() 不包含这些标签中的文字
+NON_TEXT_TAGS = ('script', 'style', 'template')
+
+# 出现在标题文字中的HTML标签
+TAG_PATTERN = re.compile(r'</?[a-zA-Z]')
+
+ENGINES = ('lxml', 'bs4')
+
+# 文档开头的 XML 声明：lxml 不接受带 encoding 声明的 str 输入
+XML_DECLARATION = re.compile(r'^\ufeff?\s*<\?xml[^>]*>')
+# lxml 与 html.parser 词法规则不同、且 libxml2 不会报错的写法：
+# CDATA 段、原样文本元素、非常规注释、标题中的标签以及 NUL 字符
+LEXICAL_MISMATCH = re.compile(
+    r'<!\[CDATA\[|<(?:textarea|xmp|plaintext|iframe|noembed|noframes)\b|<!---?>|--!>'
+    r'|<title\b[^>]*>[^<]*<(?!/title\s*>)|\x00', re.IGNORECASE)
+ENTITY_PATTERN = re.compile(r'&([A-Za-z][A-Za-z0-9]*)(;?)')
+# 允许省略分号的旧式实体名，html.parser 会按最长前缀解码，lxml 则不会
+LEGACY_ENTITIES = tuple(sorted((name for name in HTML5_ENTITIES if not name.endswith(';')),
+                               key=len, reverse=True))
+# libxml2 修复错误嵌套时记录的错误类型，修复结果可能与 html.parser 不同
+TREE_REPAIR_ERRORS = ('ERR_TAG_NAME_MISMATCH', 'HTML_STRUCURE_ERROR')
+
+
+def _build_article(url: str, title: Optional[str], publish_date: str,
+                   content: str, links: set) -> Dict:
+    """按 fetch_page 的规则整理提取结果"""
+    # 提取并处理页面标题，过长时进行截断
+    # BeautifulSoup 返回的 NavigableString 引用整棵文档树，转为普通字符串
+    title = '无标题' if title is None else str(title)
+    if len(title) > 30:
+        title = title[:30] + '...'
+
+    # 规范化空白字符并生成文章预览内容
+    content = ' '.join(content.strip().split())
+    preview = content[:200] + '...' if len(content) > 200 else content
+
+    article = {
+        'url': url,
+        'title': title,
+        'publish_date': publish_date,
+        'preview': preview,
+        'content': content,
+        'links': list(links),
+    }
+    # 正文指纹（精确哈希与 SimHash），用于识别重复页面
+    article.update(fingerprint(content))
+    return article
+
+
+def _same_domain_link(url: str, base_domain: str, href: Optional[str]) -> Optional[str]:
+    """将链接转为绝对地址，只保留同域名链接"""
+    if href:
+        full_url = urljoin(url, href)
+        if urlparse(full_url).netloc == base_domain:
+            return full_url
+    return None
+
+
+def extract_with_bs4(url: str, html: str) -> Dict:
+    """使用 BeautifulSoup（html.parser）提取文章数据，作为兼容性兜底
+
+    Args:
+        url: 页面URL
+        html: 页面HTML文本
+
+    Returns:
+        Dict: 文章数据，字段与 fetch_page 返回值一致（不含 crawl_time 等抓取信息）
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    title = soup.title.string if soup.title else '无标题'
+
+    # 查找并提取文章发布时间
+    publish_date = ''
+    date_element = soup.find(DATE_TAGS, class_=DATE_CLASSES)
+    if date_element:
+        publish_date = date_element.get_text().strip()
+
+    # 提取文章主体内容
+    content = ''
+    content_element = soup.find(CONTENT_TAGS, class_=CONTENT_CLASSES)
+    if content_element:
+        content = content_element.get_text()
+
+    # 提取同域名下的相关链接
+    links = set()
+    base_domain = urlparse(url).netloc
+    for link in soup.find_all('a'):
+        full_url = _same_domain_link(url, base_domain, link.get('href'))
+        if full_url:
+            links.add(full_url)
+
+    return _build_article(url, title, publish_date, content, links)
+
+
+class ParserMismatch(ValueError):
+    """页面包含 lxml 与 BeautifulSoup 解析结果可能不同的写法"""
+
+
+def _entity_mismatch(html: str) -> bool:
+    """是否含有两种解析器解码方式不同的字符实体（未知实体或省略分号的旧式实体）"""
+    for name, semicolon in ENTITY_PATTERN.findall(html):
+        if semicolon:
+            if name + ';' not in HTML5_ENTITIES:
+                return True
+        elif name.startswith(LEGACY_ENTITIES):
+            return True
+    return False
+
+
+def _has_class(element, classes: Tuple[str, ...]) -> bool:
+    value = element.get('class')
+    return bool(value) and any(name in classes for name in value.split())
+
+
+def _lxml_text(element) -> str:
+    """按 BeautifulSoup get_text() 的规则拼接元素内的文字
+
+    跳过注释和 script/style/template 中的文字，但保留它们之后的尾随文字。
+    """
+    parts = []
+
+    def walk(node):
+        if node.tag in NON_TEXT_TAGS:
+            return
+        if node.text:
+            parts.append(node.text)
+        for child in node:
+            if isinstance(child.tag, str):
+                walk(child)
+            if child.tail:
+                parts.append(child.tail)
+
+    walk(element)
+    return ''.join(parts)
+
+
+def _lxml_title(element) -> Optional[str]:
+    """模拟 BeautifulSoup 的 Tag.string：只有单一文字子节点时返回该文字
+
+    lxml 按规范把 <title> 内容当作纯文本，html.parser 则会解析其中的标签，
+    因此标题文字中出现标签时同样视为没有单一文字子节点。
+    """
+    if len(element) or not element.text or TAG_PATTERN.search(element.text):
+        return None
+    return element.text
+
+
+def extract_with_lxml(url: str, html: str, strict: bool = False) -> Dict:
+    """使用 lxml 单次遍历提取文章数据
+
+    一次遍历文档同时找出标题、发布时间元素、正文元素和全部链接，
+    提取规则与 extract_with_bs4 相同。
+
+    Args:
+        url: 页面URL
+        html: 页面HTML文本
+        strict: 为True时，页面含有两种解析器结果可能不同的写法（CDATA、原样文本元素、
+            非常规注释或实体、错误嵌套的标签等）则抛出 ParserMismatch
+
+    Returns:
+        Dict: 文章数据，字段与 extract_with_bs4 一致
+
+    Raises:
+        RuntimeError: 未安装 lxml
+        ParserMismatch: strict 为True且结果可能与 extract_with_bs4 不同
+        ValueError: HTML 无法解析
+    """
+    if etree is None:
+        raise RuntimeError('未安装 lxml')
+    html = XML_DECLARATION.sub('', html, count=1)
+    if strict and (LEXICAL_MISMATCH.search(html) or _entity_mismatch(html)):
+        raise ParserMismatch('页面含有解析规则不同的写法')
+    parser = etree.HTMLParser()
+    root = etree.fromstring(html, parser)
+    if root is None:
+        raise ValueError('空文档')
+    if strict and any(error.type_name in TREE_REPAIR_ERRORS for error in parser.error_log):
+        raise ParserMismatch('页面含有错误嵌套的标签')
+
+    title_element = date_element = content_element = None
+    links = set()
+    base_domain = urlparse(url).netloc
+    for element in root.iter():
+        tag = element.tag
+        if not isinstance(tag, str):
+            continue  # 注释和处理指令
+        if tag == 'a':
+            full_url = _same_domain_link(url, base_domain, element.get('href'))
+            if full_url:
+                links.add(full_url)
+        elif tag == 'title':
+            if title_element is None:
+                title_element = element
+        if date_element is None and tag in DATE_TAGS and _has_class(element, DATE_CLASSES):
+            date_element = element
+        if content_element is None and tag in CONTENT_TAGS and _has_class(element, CONTENT_CLASSES):
+            content_element = element
+
+    title = _lxml_title(title_element) if title_element is not None else '无标题'
+    publish_date = _lxml_text(date_element).strip() if date_element is not None else ''
+    content = _lxml_text(content_element) if content_element is not None else ''
+    return _build_article(url, title, publish_date, content, links)
+
+
+def extract_timed(url: str, html: str, engine: str = 'auto') -> Tuple[Dict, str, float]:
+    """按引擎设置提取文章数据并计时
+
+    engine 为 'auto' 时优先使用 lxml，未安装、解析失败或页面含有两种解析器
+    结果可能不同的写法时回退到 BeautifulSoup，保证与 BeautifulSoup 的结果一致。
+
+    Args:
+        url: 页面URL
+        html: 页面HTML文本
+        engine: 'auto'、'lxml' 或 'bs4'
+
+    Returns:
+        Tuple: (文章数据, 实际使用的引擎, 解析耗时秒数)
+    """
+    if engine in ('auto', 'lxml') and etree is not None:
+        start = time.perf_counter()
+        try:
+            return extract_with_lxml(url, html, strict=engine == 'auto'), 'lxml', time.perf_counter() - start
+        except ParserMismatch:
+            pass  # 预期内的回退，不输出日志
+        except Exception as e:
+            if engine == 'lxml':
+                raise
+            print(f'lxml 解析 {url} 出错，改用 BeautifulSoup: {str(e)}')
+    start = time.perf_counter()
+    return extract_with_bs4(url, html), 'bs4', time.perf_counter() - start
+
+
+def init_extract_worker():
+    """解析进程的初始化函数：忽略 SIGINT
+
+    Ctrl+C 会发给整个进程组，由主进程负责停止爬取并关闭进程池，
+    解析进程若也收到中断会在任务中途抛出 KeyboardInterrupt，使进程池损坏。
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def extract_page(url: str, content: bytes, encoding: Optional[str],
+                 engine: str = 'auto') -> Tuple[Dict, str, float]:
+    """解析阶段的入口，供进程池调用
+
+    下载线程只传入原始字节，解码和解析都在工作进程中完成，
+    返回精简的文章记录，避免CPU密集的解析受GIL限制。
+
+    Args:
+        url: 页面URL
+        content: 响应体字节
+        encoding: 响应头声明的编码
+        engine: 解析引擎
+
+    Returns:
+        Tuple: 同 extract_timed
+    """
+    return extract_timed(url, decode_body(content, encoding), engine)
+
+
+class ArticleExtractor:
+    """可切换解析引擎的文章提取器
+
+    engine 为 'auto' 时优先使用 lxml，未安装或解析失败时回退到 BeautifulSoup（见 extract_timed）；
+    同时按引擎累计解析耗时，便于对比两种引擎每页的解析时间。
+
+    属性:
+        engine: 'auto'、'lxml' 或 'bs4'
+    """
+
+    def __init__(self, engine: str = 'auto'):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.parse_time = dict.fromkeys(ENGINES, 0.0)
+        self.parse_count = dict.fromkeys(ENGINES, 0)
+
+    def extract(self, url: str, html: str) -> Dict:
+        """在当前线程中提取文章数据
+
+        Args:
+            url: 页面URL
+            html: 页面HTML文本
+
+        Returns:
+            Dict: 文章数据（不含 crawl_time 等抓取信息）
+        """
+        article_data, engine, elapsed = extract_timed(url, html, self.engine)
+        self.record(engine, elapsed)
+        return article_data
+
+    def record(self, engine: str, elapsed: float):
+        """累计一次解析耗时（进程池中解析的页面由调用方回填）"""
+        with self._lock:
+            self.parse_time[engine] += elapsed
+            self.parse_count[engine] += 1
+
+    def stats(self) -> Dict[str, Dict]:
+        """各引擎的解析页数与平均每页耗时（毫秒）"""
+        return {
+            engine: {
+                'pages': self.parse_count[engine],
+                'avg_ms': self.parse_time[engine] / self.parse_count[engine] * 1000
+                if self.parse_count[engine] else 0.0,
+            }
+            for engine in ENGINES
+        }
+
+
+def compare_engines(url: str, html: str) -> Dict:
+    """用两种引擎分别解析同一页面，对比耗时和结果是否一致
+
+    Args:
+        url: 页面URL
+        html: 页面HTML文本
+
+    Returns:
+        Dict: 各引擎耗时（毫秒）及 identical（两者结果是否完全相同）
+    """
+    result = {}
+    articles = {}
+    for engine, func in (('bs4', extract_with_bs4), ('lxml', extract_with_lxml)):
+        start = time.perf_counter()
+        articles[engine] = func(url, html)
+        result[engine + '_ms'] = (time.perf_counter() - start) * 1000
+    # 链接来自集合，顺序不固定，比较时排序
+    for article in articles.values():
+        article['links'] = sorted(article['links'])
+    result['identical'] = articles['bs4'] == articles['lxml']
+    return result
+
+
+def _parity_page(body: str) -> str:
+    return ('<html><head><title>T</title></head><body><div class="post-content">' + body +
+            '</div><span class="date">2024-01-01</span><a href="/z">z</a></body></html>')
+
+
+# 两种解析器处理方式不同（或容易不同）的写法，check_parity 用来确认
+# extract_timed('auto') 的结果始终与 BeautifulSoup 一致
+PARITY_CASES = {
+    'xml_declaration': '<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE html>'
+                       '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>T</title></head>'
+                       '<body><span class="date">2024-01-01</span><div class="post-content">'
+                       '<p>正文</p><a href="/x">x</a></div></body></html>',
+    'cdata': _parity_page('before <![CDATA[inside <b>cdata</b>]]> after'),
+    'cdata_in_script': _parity_page('a<script>//<![CDATA[\nvar x=1;\n//]]></script> b'),
+    'misnested': _parity_page('<b>bold <i>both</b> italic</i> tail'),
+    'block_in_inline': '<html><body><div class="post-content"><b>x<div>y</b>z</div>w</div></body></html>',
+    'stray_end_tags': '<html><body></p><div class="post-content">a</span>b</div></body>x</html>'
+                      '<span class="date">d</span>',
+    'unclosed_p': _parity_page('<p>one<p>two<div>three</div>four'),
+    'table': '<html><body><table><div class="post-content">x<tr><td>cell</td></tr></div></table></body></html>',
+    'nested_a': _parity_page('<a href="/1">one <a href="/2">two</a></a>'),
+    'textarea': _parity_page('<textarea><b>x</b></textarea>y'),
+    'raw_text': _parity_page('<xmp><b>x</b></xmp><iframe><b>y</b></iframe>z'),
+    'comments': _parity_page('a<!--->b<!-->c<!-- x --!>d -->e<!-- ok -->f'),
+    'title_in_body': _parity_page('<title>t<b>x</b></title>y'),
+    'entities': _parity_page('&foo; &copy x &lt3 &ampx &Amp; &amp; &#8212; AT&T'),
+    'attribute_entities': _parity_page('<a href="/p?a=1&copy=2">l</a><a href="/p?a&foo;b">m</a>'
+                                       '<a href="/p?a=1&b=2">n</a>'),
+    'nul': _parity_page('a\x00b'),
+}
+
+
+def check_parity(cases: Optional[Dict[str, str]] = None) -> Dict[str, bool]:
+    """确认 extract_timed 默认引擎对每个用例的结果与 BeautifulSoup 完全相同
+
+    Args:
+        cases: 用例名 -> HTML，默认使用 PARITY_CASES
+
+    Returns:
+        Dict: 用例名 -> 结果是否一致
+    """
+    url = 'http://parity.test/p'
+    result = {}
+    for name, html in (cases or PARITY_CASES).items():
+        expected = extract_with_bs4(url, html)
+        article = extract_timed(url, html)[0]
+        for data in (expected, article):
+            data['links'] = sorted(data['links'])
+        result[name] = article == expected
+    return result
@@ -0,0 +1,71 @@
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from crawler_frontier import ARTICLE_PATH
+
+
+# 默认的新鲜期规则: (URL正则, 秒数)，按顺序匹配第一条
+DEFAULT_RULES = [
+    (r'^https?://[^/]+/?$', 3600),                  # 首页更新频繁，1小时
+    (r'^https?://[^/]+' + ARTICLE_PATH.pattern[1:], 7 * 86400),  # 文章页很少变化，7天
+]
+
+
+class FreshnessPolicy:
+    """增量重爬的新鲜期策略
+
+    缓存记录在新鲜期内直接使用；超过新鲜期后，使用缓存中的
+    ETag / Last-Modified 发送条件请求，服务器返回 304 时无需重新下载和解析。
+    站点地图或订阅给出了页面的修改时间时，抓取时间不早于修改时间的缓存记录
+    同样视为新鲜，不必等到新鲜期结束，也不必发送条件请求。
+
+    属性:
+        default_ttl: 未匹配任何规则时的新鲜期（秒）
+        rules: (已编译正则, 新鲜期秒数) 列表
+    """
+
+    def __init__(self, default_ttl: float = 86400,
+                 rules: Optional[List[Tuple[str, float]]] = None):
+        self.default_ttl = default_ttl
+        self.rules = [(re.compile(pattern), ttl)
+                      for pattern, ttl in (DEFAULT_RULES if rules is None else rules)]
+
+    def ttl_for(self, url: str) -> float:
+        """返回URL适用的新鲜期（秒）"""
+        for pattern, ttl in self.rules:
+            if pattern.match(url):
+                return ttl
+        return self.default_ttl
+
+    def is_fresh(self, url: str, crawl_time: Optional[str],
+                 lastmod: Optional[datetime] = None) -> bool:
+        """判断缓存记录是否仍在新鲜期内
+
+        Args:
+            url: 文章URL
+            crawl_time: 上次抓取或校验的时间（ISO格式）
+            lastmod: 站点地图或订阅中的页面修改时间（本地时间）
+
+        Returns:
+            bool: 在新鲜期内返回True；时间缺失或无法解析时视为过期
+        """
+        if not crawl_time:
+            return False
+        try:
+            crawled = datetime.fromisoformat(str(crawl_time))
+        except ValueError:
+            return False
+        if lastmod is not None and crawled >= lastmod:
+            return True
+        return (datetime.now() - crawled).total_seconds() < self.ttl_for(url)
+
+    @staticmethod
+    def conditional_headers(article_data: Dict) -> Dict[str, str]:
+        """根据缓存记录生成条件请求头"""
+        headers = {}
+        if article_data.get('etag'):
+            headers['If-None-Match'] = article_data['etag']
+        if article_data.get('last_modified'):
+            headers['If-Modified-Since'] = article_data['last_modified']
+        return headers
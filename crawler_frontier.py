@@ -0,0 +1,161 @@
+import heapq
+import itertools
+import re
+import sys
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from typing import Dict, List, Optional
+
+
+# 博客文章页，如 /2025/02/blog-post_24.html
+ARTICLE_PATH = re.compile(r'^/\d{4}/\d{2}/[^/]+\.html$')
+# 标签、搜索、归档等导航页
+NAVIGATION_PATH = re.compile(r'^/(search|feeds)(/|$)')
+# 其他常见的列表页：按年/月/日的归档页、标签、分类、翻页
+LISTING_PATH = re.compile(r'^/(\d{4}(/\d{2}){0,2}|(tags?|labels?|category|categories|archives?|page)(/.*)?)/?$')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url: str) -> str:
+    """规范化URL，用于队列去重
+
+    处理规则：
+    1. scheme 和主机名转小写，去掉默认端口
+    2. 去掉片段（#comment-form 等）
+    3. 查询参数按键排序
+    4. 去掉路径末尾的斜杠（根路径保留为 /）
+
+    Args:
+        url: 原始URL
+
+    Returns:
+        str: 规范化后的URL
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parts.port}'
+    if parts.username:
+        host = f'{parts.username}@{host}'
+
+    path = parts.path or '/'
+    if len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/') or '/'
+
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+def url_priority(url: str) -> int:
+    """根据URL形态估计抓取优先级，数值越大越先抓取
+
+    Args:
+        url: 规范化后的URL
+
+    Returns:
+        int: 文章页 10，普通页面 0，搜索/订阅等导航页 -10
+    """
+    parts = urlsplit(url)
+    if ARTICLE_PATH.match(parts.path):
+        return 10
+    if NAVIGATION_PATH.match(parts.path) or parts.query:
+        return -10
+    return 0
+
+
+def is_navigation_page(url: str) -> bool:
+    """判断URL是否为首页、搜索、标签、归档等列表页
+
+    这类页面的正文是当前排在最前的文章，会随站点更新变化，不参与正文去重。
+    其余页面（不论URL形态是否像博客文章）都视为内容页。
+    """
+    path = urlsplit(url).path
+    return path == '/' or bool(NAVIGATION_PATH.match(path) or LISTING_PATH.match(path))
+
+
+class Frontier:
+    """按站点分组的优先级爬取队列
+
+    每个站点一个最小堆，入队和出队均为 O(log n)；
+    enqueued 集合记录所有入过队的规范化URL，重复链接在入队时即被丢弃，
+    队列中不会堆积同一URL的多个副本。
+
+    属性:
+        enqueued: 入过队（或已判定不抓取）的规范化URL集合
+    """
+
+    def __init__(self):
+        self.enqueued = set()
+        self._queues: Dict[str, List] = {}
+        self._counter = itertools.count()  # 同优先级按入队顺序出队
+        self._size = 0
+        self._url_bytes = 0  # 集合与队列中URL字符串占用的内存
+
+    def push(self, url: str, priority: int = 0, force: bool = False) -> bool:
+        """将URL加入队列
+
+        Args:
+            url: 规范化后的URL
+            priority: 优先级，数值越大越先出队
+            force: 为True时即使入过队也重新加入（用于失败重试）
+
+        Returns:
+            bool: 实际入队时返回True
+        """
+        if url in self.enqueued and not force:
+            return False
+        self.mark_seen(url)
+        host = urlsplit(url).netloc
+        heapq.heappush(self._queues.setdefault(host, []), (-priority, next(self._counter), url))
+        self._size += 1
+        return True
+
+    def mark_seen(self, url: str):
+        """把不抓取的URL记入去重集合，之后再出现时在入队前即被丢弃"""
+        if url not in self.enqueued:
+            self.enqueued.add(url)
+            self._url_bytes += sys.getsizeof(url)
+
+    def pop(self, host: str) -> Optional[str]:
+        """取出指定站点优先级最高的URL，队列为空时返回None"""
+        queue = self._queues.get(host)
+        if not queue:
+            return None
+        _, _, url = heapq.heappop(queue)
+        if not queue:
+            del self._queues[host]
+        self._size -= 1
+        return url
+
+    def peek(self, host: str) -> Optional[str]:
+        """查看指定站点下一个URL但不出队"""
+        queue = self._queues.get(host)
+        return queue[0][2] if queue else None
+
+    def hosts(self) -> List[str]:
+        """返回有待爬取URL的站点，队首优先级高的站点排在前面"""
+        return sorted(self._queues, key=lambda host: self._queues[host][0])
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def memory_usage(self) -> int:
+        """估算队列及去重集合占用的内存（字节）"""
+        total = sys.getsizeof(self.enqueued) + self._url_bytes
+        for queue in self._queues.values():
+            # 列表本身加上每个 (priority, seq, url) 元组
+            total += sys.getsizeof(queue) + len(queue) * 72
+        return total
+
+    def stats(self) -> Dict:
+        """队列统计：待爬取数、已入队总数、站点数、内存占用"""
+        return {
+            'queued': self._size,
+            'seen': len(self.enqueued),
+            'hosts': len(self._queues),
+            'memory_bytes': self.memory_usage(),
+        }
@@ -1,17 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext
-import requests
 import threading
-from concurrent.futures import ThreadPoolExecutor
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import threading
-from typing import List, Dict, Set
-import time
+from collections import deque
+from typing import List, Dict, Tuple
 import webbrowser
-import json
-import os
-from datetime import datetime
+from crawler_engine import CrawlEngine
+from crawler_ui import UiChannel
 
 class WebCrawlerGUI:
     """网站爬虫工具的图形用户界面类
@@ -22,13 +16,12 @@ class WebCrawlerGUI:
     - 搜索功能
     - 实时进度显示
     
+    爬取、存储和搜索由 CrawlEngine 完成，本类只负责界面：
+    引擎的回调把事件写入界面更新通道，由界面线程批量显示。
+    
     属性:
         root: tkinter根窗口对象
-        is_crawling: 爬虫运行状态标志
-        crawled_urls: 已爬取URL集合
-        crawled_count: 已爬取文章计数
-        max_articles: 最大爬取文章数限制
-        articles_cache: 文章缓存字典
+        engine: 爬虫引擎
         search_results: 搜索结果列表
     """
     
@@ -55,27 +48,39 @@ class WebCrawlerGUI:
         # 创建GUI组件
         self.create_widgets()
         
-        # 爬虫状态
-        self.is_crawling = False
-        self.crawled_urls = set()
-        self.crawled_count = 0
-        self.max_articles = float('inf')  # 移除爬取数量限制
-        
         # 统计信息
         self.total_articles = 0
         self.total_views = 0
         self.avg_article_length = 0
         
-        # 缓存相关
-        self.cache_dir = 'cache'
-        os.makedirs(self.cache_dir, exist_ok=True)
-        self.articles_cache = self.load_cache()
-        
         # 搜索相关
         self.search_results = []
         
+        # 爬取线程，停止后仍在收尾时不允许开始新的爬取
+        self.crawl_thread = None
+        
+        # 界面更新：爬取线程写入通道，界面线程每 ui_interval 毫秒批量刷新一次，
+        # 结果区只保留最近 max_result_entries 条
+        self.ui_interval = 100
+        self.max_result_entries = 500
+        self.result_entry_lines = deque()  # 结果区中每个条目占用的行数
+        self.ui_updates = UiChannel(max_entries=self.max_result_entries)
+        
+        # 爬虫引擎：回调在爬取线程中触发，只写入界面更新通道
+        self.engine = CrawlEngine(
+            'crawler_data.db', cache_dir='cache',
+            on_progress=self.ui_updates.set_progress,
+            on_article=self.ui_updates.add_article,
+            on_error=self.report_error,
+            on_stats=self.ui_updates.mark_stats,
+            on_complete=lambda finished: self.root.after(0, self.on_crawl_complete))
+        self.root.after(self.ui_interval, self.poll_ui_updates)
+        
         # 更新统计信息
         self.update_statistics()
+        
+        # 关闭窗口前提交尚未写入的缓存
+        self.root.protocol('WM_DELETE_WINDOW', self.on_close)
     
     def create_widgets(self):
         """创建GUI界面组件
@@ -98,6 +103,16 @@ class WebCrawlerGUI:
         self.url_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         self.url_entry.insert(0, 'https://hwv430.blogspot.com/')  # 默认URL
         
+        ttk.Label(url_frame, text='并发数:').pack(side=tk.LEFT, padx=(10, 0))
+        self.workers_var = tk.IntVar(value=5)
+        ttk.Spinbox(url_frame, from_=1, to=64, width=4,
+                    textvariable=self.workers_var).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(url_frame, text='每站点速率/秒:').pack(side=tk.LEFT, padx=(10, 0))
+        self.rate_var = tk.DoubleVar(value=2.0)
+        ttk.Spinbox(url_frame, from_=0.1, to=100, increment=0.5, width=5,
+                    textvariable=self.rate_var).pack(side=tk.LEFT, padx=5)
+        
         # 统计信息显示区域
         stats_frame = ttk.Frame(self.root)
         stats_frame.pack(fill=tk.X, padx=20, pady=5)
@@ -116,6 +131,16 @@ class WebCrawlerGUI:
                                   style='Custom.TButton')
         self.crawl_btn.pack(side=tk.LEFT, padx=5)
         
+        # 断点续爬开关
+        self.resume_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(btn_frame, text='断点续爬',
+                        variable=self.resume_var).pack(side=tk.LEFT, padx=5)
+        
+        # 增量更新开关：过期的缓存页面发送条件请求
+        self.revalidate_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(btn_frame, text='增量更新',
+                        variable=self.revalidate_var).pack(side=tk.LEFT, padx=5)
+        
         # 搜索框和按钮
         ttk.Label(btn_frame, text='搜索:').pack(side=tk.LEFT, padx=(20, 5))
         self.search_entry = ttk.Entry(btn_frame, font=('微软雅黑', 12))
@@ -166,9 +191,13 @@ class WebCrawlerGUI:
         self.result_text.tag_configure('highlight', foreground='#4a90e2')
     
     def start_crawling(self):
-        if self.is_crawling:
-            self.is_crawling = False
-            self.crawl_btn.configure(text='开始爬取')
+        # 停止后爬取线程还要等进行中的请求完成、提交缓冲区，
+        # 按钮在 on_crawl_complete 之前保持禁用，两次爬取不会同时使用同一个引擎
+        if self.engine.is_crawling:
+            self.engine.stop()
+            self.crawl_btn.configure(text='正在停止...', state=tk.DISABLED)
+            return
+        if self.crawl_thread is not None and self.crawl_thread.is_alive():
             return
         
         url = self.url_entry.get().strip()
@@ -176,169 +205,45 @@ class WebCrawlerGUI:
             self.result_text.insert(tk.END, '请输入有效的URL\n')
             return
         
-        self.is_crawling = True
+        try:
+            max_workers = int(self.workers_var.get())
+        except (tk.TclError, ValueError):
+            max_workers = 5
+        try:
+            host_rate = float(self.rate_var.get())
+        except (tk.TclError, ValueError):
+            host_rate = 2.0
+        self.engine.configure(max_workers=max_workers, host_rate=host_rate)
+        self.engine.resume_crawl = bool(self.resume_var.get())
+        self.engine.revalidate = bool(self.revalidate_var.get())
+        
+        self.engine.is_crawling = True
         self.crawl_btn.configure(text='停止爬取')
-        self.crawled_urls.clear()
-        self.crawled_count = 0
-        self.result_text.delete('1.0', tk.END)
+        self.ui_updates.clear()
+        self.clear_results()
         
         # 在新线程中启动爬虫
-        threading.Thread(target=lambda: self.crawl_website(url), daemon=True).start()
-    
-    def save_article_as_txt(self, article_data: Dict):
-        # 创建articles目录用于存储txt文件
-        articles_dir = os.path.join(self.cache_dir, 'articles')
-        os.makedirs(articles_dir, exist_ok=True)
-        
-        # 处理文件名，移除不合法字符
-        title = ''.join(c for c in article_data['title'] if c.isalnum() or c in (' ', '-', '_'))
-        file_name = f"{title}.txt"
-        file_path = os.path.join(articles_dir, file_name)
-        
-        try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(f"标题: {article_data['title']}\n\n")
-                f.write(f"发布时间: {article_data['publish_date']}\n")
-                f.write(f"原文链接: {article_data['url']}\n\n")
-                f.write("正文内容:\n")
-                f.write(article_data['content'])
-            print(f'文章已保存: {file_path}')
-        except Exception as e:
-            print(f'保存文章出错: {str(e)}')
+        self.crawl_thread = threading.Thread(target=self.run_crawl, args=([url],), daemon=True)
+        self.crawl_thread.start()
 
-    def fetch_page(self, url: str) -> Dict:
-        """爬取指定URL的页面内容
-        
-        该方法负责:
-        1. 检查URL是否已在缓存中
-        2. 发送HTTP请求获取页面内容
-        3. 解析页面提取所需信息
-        4. 保存文章到缓存和本地文件
-        
-        Args:
-            url: 要爬取的网页URL
-            
-        Returns:
-            Dict: 包含页面信息的字典，包括标题、发布时间、内容等
-            None: 如果爬取失败
-        """
-        # 首先检查缓存中是否已存在该文章
-        if url in self.articles_cache:
-            print(f'从缓存中获取文章: {url}')
-            article_data = self.articles_cache[url]
-            return article_data
-            
+    def run_crawl(self, seeds: List[str]):
+        """爬取线程：出错中止时在结果区显示原因（界面由 on_complete 恢复）"""
         try:
-            # 发送HTTP请求获取页面内容
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                html = response.text
-                soup = BeautifulSoup(html, 'html.parser')
-                
-                # 提取并处理页面标题，过长时进行截断
-                title = soup.title.string if soup.title else '无标题'
-                if len(title) > 30:
-                    title = title[:30] + '...'
-                
-                # 查找并提取文章发布时间
-                publish_date = ''
-                date_elements = soup.find_all(['time', 'span', 'div'], class_=['date', 'time', 'published', 'post-date'])
-                if date_elements:
-                    publish_date = date_elements[0].get_text().strip()
-                
-                # 提取文章主体内容
-                content = ''
-                content_element = soup.find(['article', 'div'], class_=['post-content', 'entry-content', 'article-content'])
-                if content_element:
-                    content = content_element.get_text().strip()
-                    content = ' '.join(content.split())  # 规范化空白字符
-                
-                # 生成文章预览内容
-                preview = content[:200] + '...' if len(content) > 200 else content
-                
-                # 提取同域名下的相关链接
-                links = set()
-                base_domain = urlparse(url).netloc
-                for link in soup.find_all('a'):
-                    href = link.get('href')
-                    if href:
-                        full_url = urljoin(url, href)
-                        if urlparse(full_url).netloc == base_domain:
-                            links.add(full_url)
-                
-                # 构建文章数据结构
-                article_data = {
-                    'url': url,
-                    'title': title,
-                    'publish_date': publish_date,
-                    'preview': preview,
-                    'content': content,
-                    'links': list(links),
-                    'crawl_time': datetime.now().isoformat()
-                }
-                
-                # 保存文章到缓存和本地文件系统
-                self.save_to_cache(url, article_data)
-                self.save_article_as_txt(article_data)
-                
-                return article_data
+            self.engine.crawl(seeds)
         except Exception as e:
-            # 错误处理：在GUI中显示错误信息
-            self.root.after(0, lambda: self.result_text.insert(tk.END, f'爬取 {url} 时出错: {str(e)}\n'))
-        return None
+            self.ui_updates.add_message(f'爬取出错中止: {str(e)}\n')
+    
+    def report_error(self, url: str, error: Exception):
+        """在GUI中显示爬取错误信息（经界面更新通道批量显示）"""
+        self.ui_updates.add_message(f'爬取 {url} 时出错: {str(error)}\n')
 
-    def crawl_website(self, start_url: str):
-        """爬取网站内容的核心方法
-        
-        该方法实现网站爬取的主要逻辑：
-        1. 初始化爬取队列
-        2. 循环处理每个URL
-        3. 提取新的链接并加入队列
-        4. 更新进度显示
-        5. 处理爬取结果
-        
-        Args:
-            start_url: 起始URL地址
-        """
-        # 初始化URL队列
-        urls_to_crawl = [start_url]
-        
-        # 使用线程池并发爬取
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            while urls_to_crawl and self.is_crawling:
-                # 获取下一个要爬取的URL
-                current_url = urls_to_crawl.pop(0)
-                if current_url in self.crawled_urls:
-                    continue
-                    
-                # 标记URL为已爬取
-                self.crawled_urls.add(current_url)
-                
-                # 更新进度显示
-                self.crawled_count += 1
-                self.root.after(0, lambda: self.progress_var.set(
-                    f'正在爬取第 {self.crawled_count} 个页面: {current_url}'))
-                
-                # 爬取当前页面
-                article_data = self.fetch_page(current_url)
-                if article_data:
-                    # 将新发现的链接加入队列
-                    new_urls = [url for url in article_data['links'] 
-                               if url not in self.crawled_urls]
-                    urls_to_crawl.extend(new_urls)
-                    
-                    # 在GUI中显示爬取结果
-                    self.root.after(0, lambda data=article_data: self.display_article(data))
-                
-                # 检查是否达到最大爬取数量限制
-                if self.crawled_count >= self.max_articles:
-                    break
-                    
-                # 添加延时避免请求过于频繁
-                time.sleep(1)
-        
-        # 爬取完成后更新界面状态
-        self.root.after(0, self.on_crawl_complete)
+    def on_crawl_complete(self):
+        """爬取结束（完成或被停止）后恢复界面状态"""
+        # 先显示通道中剩余的更新，避免其中的进度覆盖最终统计
+        self.apply_ui_updates()
+        self.crawl_btn.configure(text='开始爬取', state=tk.NORMAL)
+        self.progress_var.set(self.engine.summary())
+        self.update_statistics()
 
     def update_statistics(self):
         """更新统计信息
@@ -347,16 +252,17 @@ class WebCrawlerGUI:
         1. 总文章数量
         2. 文章平均长度
         3. 缓存使用情况
+        4. 爬取各阶段（下载、解析、保存、界面刷新等）的平均耗时
         """
-        # 计算统计数据
-        self.total_articles = len(self.articles_cache)
-        total_length = sum(len(article['content']) 
-                          for article in self.articles_cache.values())
-        self.avg_article_length = total_length / self.total_articles if self.total_articles > 0 else 0
+        # 计算统计数据（由文章缓存增量维护）
+        self.total_articles, self.avg_article_length = self.engine.statistics()
         
         # 更新统计信息显示
         stats_text = f'已缓存文章: {self.total_articles} | '
         stats_text += f'平均长度: {int(self.avg_article_length)} 字符'
+        stage_status = self.engine.profiler.status()
+        if stage_status:
+            stats_text += f'\n{stage_status}'
         self.stats_text.set(stats_text)
 
     def search_articles(self):
@@ -364,91 +270,139 @@ class WebCrawlerGUI:
         
         该方法实现文章内容的搜索功能：
         1. 获取搜索关键词
-        2. 在缓存的文章中进行全文搜索
-        3. 高亮显示搜索结果
-        4. 提供搜索结果的预览和链接
+        2. 通过全文索引（FTS5，中文按二元组切分）检索，结果按BM25排序
+        3. 按索引返回的偏移高亮显示关键词
+        4. 提供搜索结果的摘要和链接
         """
         keyword = self.search_entry.get().strip()
         if not keyword:
             return
             
         # 清空之前的搜索结果
-        self.result_text.delete('1.0', tk.END)
+        self.clear_results()
         self.search_results.clear()
         
-        # 在缓存的文章中搜索关键词
-        for url, article in self.articles_cache.items():
-            if keyword.lower() in article['content'].lower():
-                self.search_results.append(article)
+        # 通过全文索引搜索，结果已按相关度排序并带有摘要和高亮位置
+        self.search_results = self.engine.search(keyword)
                 
         # 显示搜索结果数量
         result_count = len(self.search_results)
-        self.result_text.insert(tk.END, f'找到 {result_count} 个结果\n\n')
+        entries = [[(f'找到 {result_count} 个结果\n\n', ())]]
         
-        # 显示每个搜索结果的预览
+        # 显示每个搜索结果的摘要
         for article in self.search_results:
             # 创建可点击的标题链接
-            self.result_text.insert(tk.END, article['title'], 'link')
-            self.result_text.insert(tk.END, f'\n发布时间: {article["publish_date"]}\n\n')
+            entry = [(article['title'], 'link'),
+                     (f'\n发布时间: {article["publish_date"]}\n\n', ())]
             
-            # 在预览中高亮显示关键词
-            preview = article['preview']
-            keyword_start = preview.lower().find(keyword.lower())
-            if keyword_start != -1:
-                before = preview[:keyword_start]
-                matched = preview[keyword_start:keyword_start + len(keyword)]
-                after = preview[keyword_start + len(keyword):]
-                
-                self.result_text.insert(tk.END, before)
-                self.result_text.insert(tk.END, matched, 'highlight')
-                self.result_text.insert(tk.END, after)
-            else:
-                self.result_text.insert(tk.END, preview)
+            # 按索引返回的偏移高亮显示关键词，无需再次查找
+            snippet = article['snippet']
+            position = 0
+            for start, end in article['highlights']:
+                entry.append((snippet[position:start], ()))
+                entry.append((snippet[start:end], 'highlight'))
+                position = end
+            entry.append((snippet[position:], ()))
                 
-            self.result_text.insert(tk.END, '\n' + '-'*50 + '\n')
+            entry.append(('\n' + '-'*50 + '\n', ()))
+            entries.append(entry)
+        
+        # 与 append_entries 一样记录每个条目的行数，爬取中追加新文章时按条目删除最早的内容
+        segments = []
+        for entry in entries:
+            segments.extend(entry)
+            self.result_entry_lines.append(sum(text.count('\n') for text, _ in entry))
+        # 全部结果用一次 insert 调用写入
+        self.insert_segments(segments)
+
+    def poll_ui_updates(self):
+        """界面线程的定时任务：每 ui_interval 毫秒批量应用一次界面更新"""
+        try:
+            with self.engine.profiler.stage('ui'):
+                self.apply_ui_updates()
+        finally:
+            self.root.after(self.ui_interval, self.poll_ui_updates)
 
-    def save_to_cache(self, url: str, article_data: Dict):
-        """将文章保存到缓存
+    def apply_ui_updates(self):
+        """从界面更新通道取出全部更新并一次性应用
         
         该方法负责:
-        1. 将文章数据添加到内存缓存
-        2. 将缓存数据持久化到本地文件
-        3. 更新统计信息
-        
-        Args:
-            url: 文章URL
-            article_data: 文章数据字典
+        1. 只显示最新的进度文字
+        2. 把新文章和错误信息用一次 insert 调用追加到结果区
+        3. 需要时刷新统计信息
         """
-        # 更新内存缓存
-        self.articles_cache[url] = article_data
+        progress, entries, stats_dirty, dropped = self.ui_updates.drain()
+        if progress is not None:
+            self.progress_var.set(progress)
+        if entries:
+            if dropped:
+                entries.insert(0, ('message', f'... 爬取过快，省略了 {dropped} 条结果 ...\n'))
+            self.append_entries(entries)
+        if stats_dirty:
+            self.update_statistics()
+
+    def article_segments(self, article_data: Dict) -> List[Tuple[str, object]]:
+        """生成一篇文章在结果区中的显示内容
         
-        try:
-            # 将缓存写入JSON文件
-            cache_file = os.path.join(self.cache_dir, 'articles.json')
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.articles_cache, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f'保存缓存出错: {str(e)}')
+        Args:
+            article_data: 包含文章信息的字典
             
-        # 更新统计信息
-        self.update_statistics()
-    
-    def load_cache(self) -> Dict:
-        """加载缓存数据
+        Returns:
+            List: (文字, 样式标签) 列表
+        """
+        # 分隔线、标题和URL
+        segments = [
+            ('='*50 + '\n', ()),
+            ('标题: ', 'highlight'),
+            (article_data['title'], 'link'),
+            ('\n\n', ()),
+            ('URL: ', 'highlight'),
+            (f'{article_data["url"]}\n\n', ()),
+        ]
         
-        从本地文件加载已缓存的文章数据。如果缓存文件不存在，则返回空字典。
+        # 显示发布时间
+        if article_data.get('publish_date'):
+            segments.append(('发布时间: ', 'highlight'))
+            segments.append((f'{article_data["publish_date"]}\n\n', ()))
+        
+        # 预览内容和底部分隔线
+        segments.append(('预览内容: ', 'highlight'))
+        segments.append((f'{article_data["preview"]}\n', ()))
+        segments.append(('\n' + '='*50 + '\n\n', ()))
+        return segments
+
+    def append_entries(self, entries: List[Tuple[str, object]]):
+        """把一批文章和文字信息追加到结果区，超出条目上限时删除最早的条目
         
-        Returns:
-            Dict: 包含已缓存文章数据的字典
+        Args:
+            entries: ('article', 文章数据) 或 ('message', 文字) 列表
         """
-        cache_file = os.path.join(self.cache_dir, 'articles.json')
-        if os.path.exists(cache_file):
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f'加载缓存出错: {str(e)}')
-        return {}
+        segments = []
+        for kind, value in entries:
+            entry = self.article_segments(value) if kind == 'article' else [(value, ())]
+            segments.extend(entry)
+            self.result_entry_lines.append(sum(text.count('\n') for text, _ in entry))
+        self.insert_segments(segments)
+        
+        removed = 0
+        while len(self.result_entry_lines) > self.max_result_entries:
+            removed += self.result_entry_lines.popleft()
+        if removed:
+            self.result_text.delete('1.0', f'{removed + 1}.0')
+
+    def insert_segments(self, segments: List[Tuple[str, object]]):
+        """用一次 Text.insert 调用写入多段带样式的文字"""
+        if not segments:
+            return
+        args = []
+        for text, tags in segments:
+            args.extend((text, tags))
+        self.result_text.insert(tk.END, *args)
+
+    def clear_results(self):
+        """清空结果区"""
+        self.result_text.delete('1.0', tk.END)
+        self.result_entry_lines.clear()
 
     def display_article(self, article_data):
         """在GUI中显示文章信息
@@ -456,29 +410,12 @@ class WebCrawlerGUI:
         Args:
             article_data: 包含文章信息的字典
         """
-        # 添加分隔线
-        self.result_text.insert(tk.END, '='*50 + '\n')
-        
-        # 显示文章标题
-        self.result_text.insert(tk.END, '标题: ', 'highlight')
-        self.result_text.insert(tk.END, article_data['title'], 'link')
-        self.result_text.insert(tk.END, '\n\n')
-        
-        # 显示URL
-        self.result_text.insert(tk.END, 'URL: ', 'highlight')
-        self.result_text.insert(tk.END, f'{article_data["url"]}\n\n')
-        
-        # 显示发布时间
-        if article_data.get('publish_date'):
-            self.result_text.insert(tk.END, '发布时间: ', 'highlight')
-            self.result_text.insert(tk.END, f'{article_data["publish_date"]}\n\n')
-        
-        # 显示预览内容
-        self.result_text.insert(tk.END, '预览内容: ', 'highlight')
-        self.result_text.insert(tk.END, f'{article_data["preview"]}\n')
-        
-        # 添加底部分隔线
-        self.result_text.insert(tk.END, '\n' + '='*50 + '\n\n')
+        self.append_entries([('article', article_data)])
+
+    def on_close(self):
+        """关闭窗口：停止爬虫并提交缓冲区中的文章"""
+        self.engine.close()
+        self.root.destroy()
 
     def on_link_click(self, event):
         """处理链接点击事件
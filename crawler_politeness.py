@@ -0,0 +1,221 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+
+# 视为“服务器要求放慢”的状态码
+THROTTLE_STATUS = (429, 503)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 响应头
+
+    Args:
+        value: 响应头的值，可能是秒数或HTTP日期
+
+    Returns:
+        float: 需要等待的秒数
+        None: 响应头缺失或无法解析
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """令牌桶限速器
+
+    属性:
+        rate: 每秒补充的令牌数
+        capacity: 桶容量，即允许的最大突发请求数
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, now: float) -> bool:
+        """尝试取出一个令牌，成功返回True"""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now: float) -> float:
+        """距离下一个可用令牌的秒数"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class HostState:
+    """单个站点（netloc）的限速与退避状态"""
+
+    def __init__(self, rate: float, burst: float, min_delay: float):
+        self.bucket = TokenBucket(rate, burst)
+        self.delay = min_delay          # AIMD 调节的请求间隔
+        self.last_request = 0.0         # 上次发出请求的时间
+        self.blocked_until = 0.0        # Retry-After 或退避期间禁止请求
+        self.in_flight = 0              # 正在进行的请求数
+        self.latency = None             # 响应延迟的指数滑动平均
+        self.error_rate = 0.0           # 错误率的指数滑动平均
+
+
+class HostScheduler:
+    """按站点限速与退避的调度器
+
+    该类为每个站点维护一个令牌桶和自适应请求间隔：
+    1. 令牌桶限制平均速率与突发请求数
+    2. 遇到 429/503 时遵守 Retry-After，并成倍放大请求间隔（乘性退避）
+    3. 请求成功时按固定步长缩短间隔（加性恢复），但不低于观测延迟的一定比例
+    4. 爬虫只从当前可请求的站点取URL，慢站点不会阻塞其他站点
+
+    属性:
+        rate: 每个站点每秒允许的请求数
+        burst: 每个站点允许的突发请求数
+        max_per_host: 每个站点同时在途的最大请求数
+        max_retries: 被限流的URL最多重试次数
+    """
+
+    def __init__(self, rate: float = 2.0, burst: float = 4, max_per_host: int = 4,
+                 min_delay: float = 0.0, max_delay: float = 60.0,
+                 delay_step: float = 0.05, latency_factor: float = 0.5,
+                 max_retries: int = 3):
+        self.rate = rate
+        self.burst = burst
+        self.max_per_host = max_per_host
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.delay_step = delay_step
+        self.latency_factor = latency_factor
+        self.max_retries = max_retries
+
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, HostState] = {}
+        self._retries: Dict[str, int] = {}      # URL -> 已重试次数
+        self._retry_pending = set()             # 等待重新入队的URL
+
+    def _state(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = HostState(self.rate, self.burst, self.min_delay)
+            self._hosts[host] = state
+        return state
+
+    def try_acquire(self, host: str) -> bool:
+        """尝试为站点申请一次请求配额
+
+        Args:
+            host: 站点netloc
+
+        Returns:
+            bool: 当前可以向该站点发起请求时返回True
+        """
+        with self._lock:
+            state = self._state(host)
+            now = time.monotonic()
+            if (now < state.blocked_until
+                    or state.in_flight >= self.max_per_host
+                    or now - state.last_request < state.delay
+                    or not state.bucket.try_acquire(now)):
+                return False
+            state.in_flight += 1
+            state.last_request = now
+            return True
+
+    def wait_time(self, host: str) -> float:
+        """距离该站点下一次可请求的秒数（不考虑在途请求数）"""
+        with self._lock:
+            state = self._state(host)
+            now = time.monotonic()
+            return max(state.blocked_until - now,
+                       state.last_request + state.delay - now,
+                       state.bucket.wait_time(now),
+                       0.0)
+
+    def release(self, host: str):
+        """请求结束（无论成功与否）后归还在途名额"""
+        with self._lock:
+            state = self._state(host)
+            state.in_flight = max(0, state.in_flight - 1)
+
+    def record_response(self, url: str, host: str, status: Optional[int],
+                        latency: float, retry_after: Optional[str] = None):
+        """记录一次请求结果并调整该站点的请求间隔
+
+        Args:
+            url: 请求的URL
+            host: 站点netloc
+            status: HTTP状态码，请求异常时为None
+            latency: 请求耗时（秒）
+            retry_after: 响应中的 Retry-After 头
+        """
+        with self._lock:
+            state = self._state(host)
+            now = time.monotonic()
+            failed = status is None or status in THROTTLE_STATUS or status >= 500
+            state.error_rate = state.error_rate * 0.8 + (0.2 if failed else 0.0)
+            if state.latency is None:
+                state.latency = latency
+            else:
+                state.latency = state.latency * 0.8 + latency * 0.2
+
+            if failed:
+                # 乘性退避：间隔翻倍
+                state.delay = min(self.max_delay, max(state.delay * 2, 1.0 / self.rate))
+                wait = parse_retry_after(retry_after)
+                if wait is None:
+                    wait = state.delay
+                state.blocked_until = max(state.blocked_until, now + min(wait, self.max_delay))
+                if status in THROTTLE_STATUS or status is None:
+                    attempts = self._retries.get(url, 0)
+                    if attempts < self.max_retries:
+                        self._retries[url] = attempts + 1
+                        self._retry_pending.add(url)
+            else:
+                # 加性恢复，但不快于服务器延迟允许的节奏；错误率偏高时暂不恢复
+                if state.error_rate < 0.1:
+                    state.delay -= self.delay_step
+                floor = max(self.min_delay, state.latency * self.latency_factor)
+                state.delay = min(self.max_delay, max(state.delay, floor))
+                self._retries.pop(url, None)
+
+    def take_retry(self, url: str) -> bool:
+        """URL因限流失败且仍可重试时返回True（每次失败只返回一次）"""
+        with self._lock:
+            if url in self._retry_pending:
+                self._retry_pending.discard(url)
+                return True
+            return False
+
+    def host_stats(self) -> Dict[str, Dict]:
+        """返回各站点当前的限速状态，便于显示和调试"""
+        with self._lock:
+            return {
+                host: {
+                    'delay': state.delay,
+                    'in_flight': state.in_flight,
+                    'latency': state.latency,
+                    'error_rate': state.error_rate,
+                }
+                for host, state in self._hosts.items()
+            }
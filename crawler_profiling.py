@@ -0,0 +1,266 @@
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+
+# 爬取各阶段的名称与显示名，按处理顺序排列
+STAGES = {
+    'fetch': '下载',
+    'parse': '解析',
+    'dedup': '查重',
+    'links': '链接入队',
+    'persist': '保存',
+    'export': '导出',
+    'dispatch': '事件回调',
+    'ui': '界面刷新',
+    'wait': '主循环等待',
+}
+
+# 耗时直方图的桶上界（毫秒），最后一个桶收集更慢的请求
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+                       1000, 2500, 5000, 10000, float('inf'))
+
+
+class StageStats:
+    """一个阶段的耗时统计：次数、总耗时、最大值及直方图"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(HISTOGRAM_BOUNDS_MS)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, seconds * 1000)] += 1
+
+    def percentile(self, percent: float) -> float:
+        """按直方图估算百分位数（毫秒），取所在桶的上界，最后一个桶取最大值"""
+        if not self.count:
+            return 0.0
+        rank = percent / 100 * self.count
+        seen = 0
+        for bound, count in zip(HISTOGRAM_BOUNDS_MS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max * 1000)
+        return self.max * 1000
+
+
+class Profiler:
+    """爬取热路径的分阶段计时
+
+    该类负责:
+    1. 用 stage(name) 包住下载、解析、保存等阶段，累计次数、耗时和直方图
+    2. trace 为True时记录每一次阶段的起止时间，爬取结束后可导出为
+       Chrome trace 文件（chrome://tracing 或 https://ui.perfetto.dev 打开）
+    3. 生成爬取结束时的摘要和界面统计栏中的简短文字
+
+    计时只是两次 perf_counter 和一次加锁，默认一直开启。
+
+    属性:
+        trace: 是否记录每次阶段的起止时间
+        max_events: 最多记录的事件数，超过后只计时不记录
+        dropped_events: 因超过上限未记录的事件数
+    """
+
+    def __init__(self, trace: bool = False, max_events: int = 200000):
+        self.trace = trace
+        self.max_events = max_events
+        self._lock = threading.Lock()
+        self._stats: Dict[str, StageStats] = defaultdict(StageStats)
+        self._events: List[Tuple[str, int, float, float]] = []  # (阶段, 线程, 开始, 耗时)
+        self._thread_names: Dict[int, str] = {}
+        self._origin = time.perf_counter()
+        self.dropped_events = 0
+
+    def reset(self, trace: Optional[bool] = None):
+        """清除统计和事件，每次爬取开始时调用"""
+        with self._lock:
+            if trace is not None:
+                self.trace = trace
+            self._stats.clear()
+            self._events.clear()
+            self._thread_names.clear()
+            self._origin = time.perf_counter()
+            self.dropped_events = 0
+
+    @contextmanager
+    def stage(self, name: str):
+        """统计 with 块的耗时，计入 name 阶段"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, start)
+
+    def record(self, name: str, seconds: float, start: Optional[float] = None):
+        """记录一次阶段耗时
+
+        Args:
+            name: 阶段名，见 STAGES
+            seconds: 耗时（秒）
+            start: 开始时间（perf_counter）；在其他进程中测得的耗时传入None，
+                按刚刚结束计算
+        """
+        if start is None:
+            start = time.perf_counter() - seconds
+        with self._lock:
+            self._stats[name].add(seconds)
+            if not self.trace:
+                return
+            if len(self._events) >= self.max_events:
+                self.dropped_events += 1
+                return
+            thread = threading.current_thread()
+            self._thread_names.setdefault(thread.ident, thread.name)
+            self._events.append((name, thread.ident, start - self._origin, seconds))
+
+    def stats(self) -> Dict[str, Dict]:
+        """各阶段的次数、总耗时（秒）、平均/p50/p90/p99/最大耗时（毫秒）"""
+        with self._lock:
+            return {
+                name: {
+                    'count': stats.count,
+                    'total_s': stats.total,
+                    'avg_ms': stats.total / stats.count * 1000 if stats.count else 0.0,
+                    'p50_ms': stats.percentile(50),
+                    'p90_ms': stats.percentile(90),
+                    'p99_ms': stats.percentile(99),
+                    'max_ms': stats.max * 1000,
+                }
+                for name, stats in sorted(self._stats.items(),
+                                          key=lambda item: list(STAGES).index(item[0])
+                                          if item[0] in STAGES else len(STAGES))
+            }
+
+    def summary(self) -> str:
+        """每个阶段一行：次数、总耗时和耗时分布"""
+        lines = []
+        for name, stats in self.stats().items():
+            lines.append(f'{STAGES.get(name, name)}: {stats["count"]} 次 共 {stats["total_s"]:.2f} s | '
+                         f'平均 {stats["avg_ms"]:.1f} / p50 {stats["p50_ms"]:.1f} / '
+                         f'p90 {stats["p90_ms"]:.1f} / p99 {stats["p99_ms"]:.1f} / '
+                         f'最大 {stats["max_ms"]:.1f} ms')
+        return '\n'.join(lines)
+
+    def status(self) -> str:
+        """界面统计栏中的简短文字：各阶段平均耗时"""
+        return ' / '.join(f'{STAGES.get(name, name)} {stats["avg_ms"]:.1f}ms'
+                          for name, stats in self.stats().items() if name != 'wait')
+
+    def write_chrome_trace(self, path: str):
+        """导出 Chrome trace 文件（Trace Event Format 的 "X" 完整事件）"""
+        with self._lock:
+            events = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid,
+                       'args': {'name': name}}
+                      for tid, name in self._thread_names.items()]
+            events.extend({'name': name, 'cat': 'crawl', 'ph': 'X', 'pid': os.getpid(), 'tid': tid,
+                           'ts': round(start * 1e6, 1), 'dur': round(seconds * 1e6, 1)}
+                          for name, tid, start, seconds in self._events)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+class SamplingProfiler:
+    """采样分析器：定时读取所有线程的调用栈
+
+    后台线程每 interval 秒通过 sys._current_frames() 取得本进程每个线程的调用栈
+    并计数，不需要修改被测代码。爬取结束后导出为 speedscope 文件
+    （https://www.speedscope.app 打开），每个线程一个火焰图。
+    解析进程池中的工作进程不在采样范围内，它们的耗时见 Profiler 的 parse 阶段。
+
+    属性:
+        interval: 采样间隔（秒）
+        samples: 已采样次数
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Dict[int, Counter] = defaultdict(Counter)
+        self._thread_names: Dict[int, str] = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = 0.0
+        self._elapsed = 0.0
+
+    def start(self):
+        self._stop.clear()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self._elapsed = time.perf_counter() - self._started
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                self._thread_names.setdefault(thread.ident, thread.name)
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                stack.reverse()
+                self._stacks[ident][tuple(stack)] += 1
+            self.samples += 1
+
+    def top(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """采样中出现在栈顶次数最多的函数"""
+        counts = Counter()
+        for stacks in self._stacks.values():
+            for stack, count in stacks.items():
+                name, filename, line = stack[-1]
+                counts[f'{name} ({os.path.basename(filename)}:{line})'] += count
+        return counts.most_common(limit)
+
+    def write_speedscope(self, path: str):
+        """导出 speedscope 文件，相同调用栈合并为一个带权重的样本"""
+        frames, frame_index = [], {}
+        profiles = []
+        for ident, stacks in self._stacks.items():
+            samples, weights = [], []
+            for stack, count in stacks.items():
+                indices = []
+                for frame in stack:
+                    if frame not in frame_index:
+                        frame_index[frame] = len(frames)
+                        frames.append({'name': frame[0], 'file': frame[1], 'line': frame[2]})
+                    indices.append(frame_index[frame])
+                samples.append(indices)
+                weights.append(count * self.interval)
+            profiles.append({
+                'type': 'sampled',
+                'name': self._thread_names.get(ident, str(ident)),
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights,
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                '$schema': 'https://www.speedscope.app/file-format-schema.json',
+                'name': f'crawl ({self.samples} samples, {self._elapsed:.1f} s)',
+                'exporter': 'crawler_profiling',
+                'shared': {'frames': frames},
+                'profiles': profiles,
+            }, f)
@@ -0,0 +1,175 @@
+import re
+import sqlite3
+from typing import Dict, List, Optional
+
+# 中日韩文字：按字二元组（bigram）切分
+CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+TOKEN_PATTERN = re.compile(rf'([{CJK_CHARS}]+)|((?:(?![{CJK_CHARS}])[^\W_])+)')
+
+# 搜索结果摘要：匹配位置之前保留的字符数与摘要总长度
+SNIPPET_BEFORE = 40
+SNIPPET_LENGTH = 200
+
+
+def tokenize(text: str, for_query: bool = False) -> List[str]:
+    """将文本切分为索引词
+
+    中日韩文字连续段切分为重叠的二元组，并在段尾补一个单字，
+    使单字查询可以用前缀匹配命中任意位置；其他文字按单词切分并转小写。
+
+    Args:
+        text: 待切分文本
+        for_query: 为True时不补段尾单字（查询只需要二元组）
+
+    Returns:
+        List[str]: 索引词列表
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        cjk_run, word = match.groups()
+        if word:
+            tokens.append(word)
+        elif len(cjk_run) == 1:
+            tokens.append(cjk_run)
+        else:
+            tokens.extend(cjk_run[i:i + 2] for i in range(len(cjk_run) - 1))
+            if not for_query:
+                tokens.append(cjk_run[-1])
+    return tokens
+
+
+def build_match_query(keyword: str) -> Optional[str]:
+    """将搜索关键词转换为FTS5查询表达式
+
+    以空白分隔的每一部分作为一个短语，各短语之间为“且”关系；
+    短语末尾是单个汉字或英文单词时使用前缀匹配。
+
+    Args:
+        keyword: 用户输入的搜索关键词
+
+    Returns:
+        str: FTS5 MATCH 表达式
+        None: 关键词中没有可检索的文字
+    """
+    phrases = []
+    for part in keyword.split():
+        tokens = tokenize(part, for_query=True)
+        if not tokens:
+            continue
+        phrase = '"' + ' '.join(tokens) + '"'
+        last = tokens[-1]
+        if len(last) == 1 or not re.match(rf'[{CJK_CHARS}]', last):
+            phrase += '*'
+        phrases.append(phrase)
+    return ' AND '.join(phrases) if phrases else None
+
+
+class SearchIndex:
+    """基于SQLite FTS5的增量全文索引
+
+    索引表 pages_fts 的 rowid 与 pages.id 一致，保存标题和正文切分后的索引词。
+    文章写入 pages 表时在同一事务内更新索引，搜索按 BM25 排序，
+    并直接返回命中位置附近的摘要及关键词在摘要中的偏移。
+
+    属性:
+        conn: 与 ArticleStore 共用的数据库连接
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'pages_fts'").fetchone()
+        if not exists:
+            # 首次建立索引时为已有文章补建索引；之后每次写入都会同步更新，
+            # 打开数据库时无需再扫描 pages 表
+            with self.conn:
+                self.conn.execute('CREATE VIRTUAL TABLE pages_fts USING fts5(tokens)')
+                self._backfill()
+
+    def _backfill(self):
+        """为建立索引之前已存在的文章补建索引"""
+        cursor = self.conn.execute('SELECT id, title, content FROM pages WHERE canonical_url IS NULL')
+        self.conn.executemany(
+            'INSERT INTO pages_fts (rowid, tokens) VALUES (?, ?)',
+            ((page_id, self._tokens(title, content)) for page_id, title, content in cursor))
+
+    @staticmethod
+    def _tokens(title: Optional[str], content: Optional[str]) -> str:
+        return ' '.join(tokenize(f'{title or ""}\n{content or ""}'))
+
+    def update(self, articles: List[Dict]):
+        """更新一批文章的索引，需在写入 pages 表的同一事务内调用
+
+        重复页面（带 canonical_url）不进入索引，搜索结果中每篇正文只出现一次。
+
+        Args:
+            articles: 已写入 pages 表的文章数据列表
+        """
+        for article in articles:
+            row = self.conn.execute('SELECT id FROM pages WHERE url = ?',
+                                    (article['url'],)).fetchone()
+            if row is None:
+                continue
+            self.conn.execute('DELETE FROM pages_fts WHERE rowid = ?', row)
+            if article.get('canonical_url'):
+                continue
+            self.conn.execute('INSERT INTO pages_fts (rowid, tokens) VALUES (?, ?)',
+                              (row[0], self._tokens(article.get('title'), article.get('content'))))
+
+    def search(self, keyword: str, limit: int = 200) -> List[Dict]:
+        """全文搜索
+
+        Args:
+            keyword: 搜索关键词
+            limit: 最多返回的结果数
+
+        Returns:
+            List[Dict]: 按相关度排序的结果，每项包含 url、title、publish_date、
+            score、snippet（摘要）和 highlights（关键词在摘要中的 (起, 止) 偏移列表）
+        """
+        query = build_match_query(keyword)
+        if query is None:
+            return []
+        # 用第一个短语在原文中定位摘要，instr 返回从1开始的字符位置
+        needle = keyword.split()[0].lower()
+        rows = self.conn.execute('''
+            SELECT p.url, p.title, p.date, p.preview, bm25(pages_fts) AS score,
+                   instr(lower(p.content), ?) AS pos,
+                   substr(p.content, max(instr(lower(p.content), ?) - ?, 1), ?) AS snippet
+            FROM pages_fts JOIN pages p ON p.id = pages_fts.rowid
+            WHERE pages_fts MATCH ?
+            ORDER BY score
+            LIMIT ?
+        ''', (needle, needle, SNIPPET_BEFORE, SNIPPET_LENGTH, query, limit)).fetchall()
+
+        results = []
+        for url, title, date, preview, score, pos, snippet in rows:
+            highlights = []
+            if pos:
+                begin = max(pos - SNIPPET_BEFORE, 1)
+                prefix = '...' if begin > 1 else ''
+                highlights = [(start + len(prefix), end + len(prefix))
+                              for start, end in self._find_all(snippet, needle, pos - begin)]
+                snippet = prefix + snippet
+            else:
+                snippet = preview or ''
+            results.append({
+                'url': url,
+                'title': title or '无标题',
+                'publish_date': date or '',
+                'score': -score,  # bm25() 越小越相关，取反后越大越相关
+                'snippet': snippet,
+                'highlights': highlights,
+            })
+        return results
+
+    @staticmethod
+    def _find_all(text: str, needle: str, first: int) -> List[tuple]:
+        """从已知的第一个命中位置开始，找出摘要中关键词的全部位置"""
+        spans = []
+        lowered = text.lower()
+        index = first
+        while index != -1:
+            spans.append((index, index + len(needle)))
+            index = lowered.find(needle, index + len(needle))
+        return spans
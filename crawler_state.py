@@ -0,0 +1,196 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+
+class CrawlSession:
+    """一次爬取会话的持久化状态
+
+    记录会话中入过队的每个URL及其状态（queued / done），
+    变更先写入缓冲区，再由 flush 批量提交，检查点开销与已爬取规模无关。
+
+    属性:
+        session_id: 会话ID
+        seed: 起始URL
+        resumed: 是否由未完成的会话恢复而来
+        persist: 提交已完成URL前调用，先把这些页面写入数据库
+    """
+
+    def __init__(self, store: 'CrawlStateStore', session_id: int, seed: str, resumed: bool):
+        self.store = store
+        self.session_id = session_id
+        self.seed = seed
+        self.resumed = resumed
+        self.persist: Optional[Callable[[], None]] = None
+        self._added: Dict[str, int] = {}   # 新入队的URL -> 优先级
+        self._done: Set[str] = set()       # 新完成的URL
+
+    def add(self, url: str, priority: int):
+        """记录新入队的URL"""
+        with self.store._lock:
+            self._added[url] = priority
+        self.store._maybe_flush(self)
+
+    def done(self, url: str):
+        """记录已处理完成的URL"""
+        with self.store._lock:
+            self._done.add(url)
+        self.store._maybe_flush(self)
+
+    def load(self) -> Tuple[List[Tuple[str, int]], Set[str]]:
+        """读取会话的检查点
+
+        Returns:
+            Tuple: (待爬取的 (url, priority) 列表, 已完成URL集合)
+        """
+        self.flush()
+        with self.store._lock:
+            queued, done = [], set()
+            cursor = self.store.conn.execute(
+                'SELECT url, priority, state FROM crawl_frontier WHERE session_id = ?',
+                (self.session_id,))
+            for url, priority, state in cursor:
+                if state == 'done':
+                    done.add(url)
+                else:
+                    queued.append((url, priority))
+            return queued, done
+
+    def flush(self):
+        """将缓冲区中的变更在一个事务内写入数据库"""
+        self.store._flush(self)
+
+    def close(self, status: str):
+        """提交剩余变更并记录会话结束状态
+
+        Args:
+            status: 'finished' 表示队列已爬空，'stopped' 表示被中途停止
+        """
+        self.flush()
+        with self.store._lock, self.store.conn:
+            self.store.conn.execute(
+                'UPDATE crawl_sessions SET status = ?, updated_at = ? WHERE id = ?',
+                (status, datetime.now().isoformat(), self.session_id))
+            if status == 'finished':
+                # 已完成的会话不会再恢复，释放检查点占用的空间
+                self.store.conn.execute(
+                    'DELETE FROM crawl_frontier WHERE session_id = ?', (self.session_id,))
+
+
+class CrawlStateStore:
+    """可恢复的爬取状态存储
+
+    在 crawler_data.db 中维护两张表：
+    - crawl_sessions: 每次爬取的起始URL与状态
+    - crawl_frontier: 会话中每个URL的优先级与状态
+
+    程序被停止或崩溃后，以相同的起始URL再次爬取即可从检查点继续，
+    已完成的页面不会被重新遍历。
+
+    属性:
+        db_path: 数据库文件路径
+        batch_size: 累积多少条变更后提交一次
+        flush_interval: 距上次提交超过该秒数时强制提交
+    """
+
+    def __init__(self, db_path: str = 'crawler_data.db', batch_size: int = 200,
+                 flush_interval: float = 2.0):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._last_flush = time.monotonic()
+
+        # 分布式爬取时多个进程共用数据库，写锁最多等待 30 秒
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_sessions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    seed TEXT,
+                    status TEXT,
+                    created_at TIMESTAMP,
+                    updated_at TIMESTAMP
+                )
+            ''')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_frontier (
+                    session_id INTEGER,
+                    url TEXT,
+                    priority INTEGER DEFAULT 0,
+                    state TEXT DEFAULT 'queued',
+                    PRIMARY KEY (session_id, url)
+                )
+            ''')
+
+    def open_session(self, seed: str, resume: bool = True) -> CrawlSession:
+        """打开爬取会话
+
+        Args:
+            seed: 起始URL（规范化后）
+            resume: 为True时优先恢复该起始URL最近一次未完成的会话
+
+        Returns:
+            CrawlSession: 恢复的或新建的会话
+        """
+        with self._lock:
+            now = datetime.now().isoformat()
+            row = self.conn.execute(
+                "SELECT id FROM crawl_sessions WHERE seed = ? AND status != 'finished' "
+                "ORDER BY id DESC LIMIT 1", (seed,)).fetchone()
+            with self.conn:
+                if row and resume:
+                    self.conn.execute(
+                        "UPDATE crawl_sessions SET status = 'running', updated_at = ? WHERE id = ?",
+                        (now, row[0]))
+                    return CrawlSession(self, row[0], seed, resumed=True)
+                # 不恢复时，旧的未完成会话不再保留检查点
+                self.conn.execute(
+                    "DELETE FROM crawl_frontier WHERE session_id IN ("
+                    "SELECT id FROM crawl_sessions WHERE seed = ? AND status != 'finished')",
+                    (seed,))
+                self.conn.execute(
+                    "UPDATE crawl_sessions SET status = 'finished' WHERE seed = ? AND status != 'finished'",
+                    (seed,))
+                cursor = self.conn.execute(
+                    "INSERT INTO crawl_sessions (seed, status, created_at, updated_at) "
+                    "VALUES (?, 'running', ?, ?)", (seed, now, now))
+            return CrawlSession(self, cursor.lastrowid, seed, resumed=False)
+
+    def session_seed(self, session_id: int) -> Optional[str]:
+        """会话的起始URL（多个时以空格连接），会话不存在时返回None"""
+        with self._lock:
+            row = self.conn.execute('SELECT seed FROM crawl_sessions WHERE id = ?', (session_id,)).fetchone()
+            return row[0] if row else None
+
+    def _maybe_flush(self, session: CrawlSession):
+        with self._lock:
+            if (len(session._added) + len(session._done) >= self.batch_size or
+                    time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush(session)
+
+    def _flush(self, session: CrawlSession):
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not session._added and not session._done:
+                return
+            # 文章缓冲区先于检查点提交，崩溃后不会出现已完成、数据库中却没有的页面
+            if session._done and session.persist:
+                session.persist()
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO crawl_frontier (session_id, url, priority) VALUES (?, ?, ?)',
+                    [(session.session_id, url, priority) for url, priority in session._added.items()])
+                self.conn.executemany(
+                    "INSERT INTO crawl_frontier (session_id, url, state) VALUES (?, ?, 'done') "
+                    "ON CONFLICT(session_id, url) DO UPDATE SET state = 'done'",
+                    [(session.session_id, url) for url in session._done])
+                self.conn.execute(
+                    'UPDATE crawl_sessions SET updated_at = ? WHERE id = ?',
+                    (datetime.now().isoformat(), session.session_id))
+            session._added.clear()
+            session._done.clear()
@@ -0,0 +1,480 @@
+import sqlite3
+import threading
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from crawler_dedup import (NEAR_DUPLICATE_DISTANCE, hamming_distance, simhash_bands,
+                           to_signed, to_unsigned)
+from crawler_search import SearchIndex
+
+
+class ArticleStore:
+    """基于SQLite的文章存储后端
+
+    使用 crawler_data.db 中的 pages 表保存文章，替代整体重写的 articles.json：
+    - WAL 模式，读写互不阻塞，写入中途崩溃不会损坏已有数据
+    - 批量写入，每次持久化只提交新增/变更的文章
+    - 首次打开时自动迁移旧的 cache/articles.json
+    - 写入文章时在同一事务内更新全文索引（见 SearchIndex）
+    - 正文与已有文章完全相同的页面只记录 canonical_url，正文只保存一份；
+      近似的页面保留自己的正文，用 similar_url 记录与哪篇文章近似
+
+    属性:
+        db_path: 数据库文件路径
+        batch_size: 累积多少篇文章后提交一次事务
+        flush_interval: 距上次提交超过该秒数时强制提交
+    """
+
+    def __init__(self, db_path: str = 'crawler_data.db', batch_size: int = 50,
+                 flush_interval: float = 2.0):
+        """打开（必要时创建）文章数据库
+
+        Args:
+            db_path: 数据库文件路径
+            batch_size: 批量提交的文章数量
+            flush_interval: 批量提交的最长间隔（秒）
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._lock = threading.RLock()
+        self._pending: Dict[str, Dict] = {}  # 尚未提交的文章，按URL去重
+        self._last_flush = time.monotonic()
+
+        # 分布式爬取时多个进程共用数据库，写锁最多等待 30 秒
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._ensure_schema()
+        self.index = SearchIndex(self.conn)
+
+    def _ensure_schema(self):
+        """创建 pages 表并补齐旧库缺少的列"""
+        with self.conn:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS pages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT UNIQUE,
+                    title TEXT,
+                    date TEXT,
+                    content TEXT,
+                    crawl_time TIMESTAMP,
+                    priority INTEGER DEFAULT 0
+                )
+            ''')
+            columns = {row[1] for row in self.conn.execute('PRAGMA table_info(pages)')}
+            # 旧库只有基础列，预览、链接列表和HTTP校验信息需要追加
+            for column in ('preview', 'links', 'etag', 'last_modified'):
+                if column not in columns:
+                    self.conn.execute(f'ALTER TABLE pages ADD COLUMN {column} TEXT')
+            # 正文长度单独成列，统计时不必读取正文
+            if 'content_length' not in columns:
+                self.conn.execute('ALTER TABLE pages ADD COLUMN content_length INTEGER')
+                self.conn.execute('UPDATE pages SET content_length = length(content)')
+            self.conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_pages_content_length ON pages (content_length)')
+            # 正文指纹、重复页面指向的原始URL及近似页面指向的相似文章（见 crawler_dedup）
+            for column, column_type in (('content_hash', 'TEXT'), ('simhash', 'INTEGER'),
+                                        ('canonical_url', 'TEXT'), ('similar_url', 'TEXT')):
+                if column not in columns:
+                    self.conn.execute(f'ALTER TABLE pages ADD COLUMN {column} {column_type}')
+            self.conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_pages_content_hash ON pages (content_hash)')
+            # SimHash 分段索引：近似重复的指纹至少有一段完全相同
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS page_simhash (
+                    band INTEGER,
+                    key INTEGER,
+                    simhash INTEGER,
+                    url TEXT,
+                    PRIMARY KEY (band, key, url)
+                ) WITHOUT ROWID
+            ''')
+            self.conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_page_simhash_url ON page_simhash (url)')
+
+    def save(self, article_data: Dict):
+        """保存一篇文章
+
+        文章先进入待提交缓冲区，达到批量大小或时间间隔后统一写入数据库，
+        因此每篇文章的持久化开销与已缓存文章数量无关。
+
+        Args:
+            article_data: 文章数据字典
+        """
+        with self._lock:
+            self._pending[article_data['url']] = article_data
+            if (len(self._pending) >= self.batch_size or
+                    time.monotonic() - self._last_flush >= self.flush_interval):
+                self.flush()
+
+    def flush(self):
+        """将缓冲区中的文章在一个事务内写入数据库"""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending:
+                return
+            rows = [self._to_row(article) for article in self._pending.values()]
+            with self.conn:
+                self.conn.executemany('''
+                    INSERT INTO pages (url, title, date, content, crawl_time, preview, links,
+                                       etag, last_modified, content_length,
+                                       content_hash, simhash, canonical_url, similar_url)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(url) DO UPDATE SET
+                        title = excluded.title,
+                        date = excluded.date,
+                        content = excluded.content,
+                        content_length = excluded.content_length,
+                        content_hash = excluded.content_hash,
+                        simhash = excluded.simhash,
+                        canonical_url = excluded.canonical_url,
+                        similar_url = excluded.similar_url,
+                        crawl_time = excluded.crawl_time,
+                        preview = excluded.preview,
+                        links = excluded.links,
+                        etag = excluded.etag,
+                        last_modified = excluded.last_modified
+                ''', rows)
+                self._update_simhash(self._pending.values())
+                self.index.update(list(self._pending.values()))
+            self._pending.clear()
+
+    def _update_simhash(self, articles):
+        """更新 SimHash 分段索引，只有原始文章（非重复、非近似页面）参与近似重复检测"""
+        urls = [(article['url'],) for article in articles]
+        self.conn.executemany('DELETE FROM page_simhash WHERE url = ?', urls)
+        self.conn.executemany(
+            'INSERT INTO page_simhash (band, key, simhash, url) VALUES (?, ?, ?, ?)',
+            [(band, key, to_signed(article['simhash']), article['url'])
+             for article in articles
+             if article.get('simhash') is not None
+             and not article.get('canonical_url') and not article.get('similar_url')
+             for band, key in simhash_bands(article['simhash'])])
+
+    def find_duplicate(self, url: str, content_hash: Optional[str],
+                       simhash: Optional[int]) -> Tuple[Optional[str], bool]:
+        """查找正文与给定指纹相同或近似的已保存文章
+
+        先按精确哈希查找正文完全相同的文章（不返回重复页面），再按 SimHash 分段
+        查找汉明距离不超过 NEAR_DUPLICATE_DISTANCE 的原始文章。
+
+        Args:
+            url: 当前页面URL（结果中排除自身）
+            content_hash: 正文精确指纹
+            simhash: 正文 SimHash
+
+        Returns:
+            Tuple: (文章URL, 正文是否完全相同)；没有重复时为 (None, False)
+        """
+        if content_hash is None:
+            return None, False
+        with self._lock:
+            # 缓冲区中尚未提交的文章
+            similar = None
+            for article in self._pending.values():
+                if article['url'] == url or article.get('canonical_url'):
+                    continue
+                if article.get('content_hash') == content_hash:
+                    return article['url'], True
+                if (similar is None and not article.get('similar_url') and
+                        simhash is not None and article.get('simhash') is not None and
+                        hamming_distance(simhash, article['simhash']) <= NEAR_DUPLICATE_DISTANCE):
+                    similar = article['url']
+
+            row = self.conn.execute(
+                'SELECT url FROM pages WHERE content_hash = ? AND url != ? '
+                'AND canonical_url IS NULL LIMIT 1', (content_hash, url)).fetchone()
+            if row:
+                return row[0], True
+            if similar or simhash is None:
+                return similar, False
+            for band, key in simhash_bands(simhash):
+                cursor = self.conn.execute(
+                    'SELECT url, simhash FROM page_simhash WHERE band = ? AND key = ? AND url != ?',
+                    (band, key, url))
+                for candidate, value in cursor:
+                    if hamming_distance(simhash, to_unsigned(value)) <= NEAR_DUPLICATE_DISTANCE:
+                        return candidate, False
+            return None, False
+
+    def load_article(self, url: str) -> Optional[Dict]:
+        """按URL读取一篇完整的文章（含正文和链接）
+
+        Args:
+            url: 文章URL
+
+        Returns:
+            Dict: 文章数据
+            None: 库中没有该文章
+        """
+        with self._lock:
+            if url in self._pending:
+                return self._pending[url]
+            # 重复页面不保存正文，从原始文章读取（近似页面有自己的正文）
+            row = self.conn.execute(
+                "SELECT p.url, p.title, p.date, COALESCE(c.content, p.content), p.crawl_time, "
+                "p.preview, p.links, p.etag, p.last_modified, p.canonical_url, p.content_hash, p.simhash, "
+                "p.similar_url "
+                "FROM pages p LEFT JOIN pages c ON c.url = p.canonical_url "
+                "WHERE p.url = ?", (url,)).fetchone()
+            return self._from_row(row) if row else None
+
+    def load_meta(self, url: str) -> Optional[Dict]:
+        """按URL读取文章的元数据，不读取正文
+
+        Args:
+            url: 文章URL
+
+        Returns:
+            Dict: url、title、publish_date、crawl_time、etag、last_modified、content_length
+            None: 库中没有该文章
+        """
+        with self._lock:
+            if url in self._pending:
+                return self._to_meta(self._pending[url])
+            row = self.conn.execute(
+                'SELECT url, title, date, crawl_time, etag, last_modified, '
+                'COALESCE(content_length, length(content)) FROM pages WHERE url = ?',
+                (url,)).fetchone()
+            if row is None:
+                return None
+            url, title, date, crawl_time, etag, last_modified, content_length = row
+            return {
+                'url': url,
+                'title': title or '无标题',
+                'publish_date': date or '',
+                'crawl_time': crawl_time,
+                'etag': etag,
+                'last_modified': last_modified,
+                'content_length': content_length or 0,
+            }
+
+    def totals(self) -> Tuple[int, int]:
+        """统计文章数量和正文总长度
+
+        只扫描 content_length 索引，不读取正文。
+
+        Returns:
+            Tuple: (文章数量, 正文总字符数)
+        """
+        with self._lock:
+            self.flush()
+            count, total = self.conn.execute(
+                'SELECT COUNT(*), SUM(content_length) FROM pages').fetchone()
+            return count, total or 0
+
+    def search(self, keyword: str, limit: int = 200) -> List[Dict]:
+        """在已缓存文章中全文搜索，结果按相关度排序
+
+        Args:
+            keyword: 搜索关键词
+            limit: 最多返回的结果数
+
+        Returns:
+            List[Dict]: 搜索结果，格式见 SearchIndex.search
+        """
+        with self._lock:
+            # 先提交缓冲区，保证刚爬取的文章也能被搜到
+            self.flush()
+            return self.index.search(keyword, limit)
+
+    def get_priorities(self, urls) -> Dict[str, int]:
+        """批量查询 pages 表中记录的抓取优先级
+
+        Args:
+            urls: URL列表
+
+        Returns:
+            Dict: URL -> priority，仅包含库中存在且优先级非零的URL
+        """
+        urls = list(urls)
+        priorities = {}
+        with self._lock:
+            # 分批查询，避免超出SQLite的参数数量上限
+            for i in range(0, len(urls), 500):
+                chunk = urls[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor = self.conn.execute(
+                    f'SELECT url, priority FROM pages WHERE url IN ({placeholders}) AND priority != 0',
+                    chunk)
+                priorities.update(cursor.fetchall())
+        return priorities
+
+    def migrate_json(self, json_path: str) -> int:
+        """一次性迁移旧版 articles.json 缓存
+
+        迁移成功后原文件被重命名为 *.migrated，之后不会重复导入。
+
+        Args:
+            json_path: 旧缓存文件路径
+
+        Returns:
+            int: 导入的文章数量
+        """
+        if not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                articles = json.load(f)
+        except Exception as e:
+            print(f'读取旧缓存出错: {str(e)}')
+            return 0
+
+        with self._lock:
+            for url, article in articles.items():
+                article.setdefault('url', url)
+                self._pending[url] = article
+            self.flush()
+        os.replace(json_path, json_path + '.migrated')
+        print(f'已将 {len(articles)} 篇文章从 {json_path} 迁移到 {self.db_path}')
+        return len(articles)
+
+    def close(self):
+        """提交剩余文章并关闭数据库连接"""
+        with self._lock:
+            self.flush()
+            self.conn.close()
+
+    @staticmethod
+    def _to_meta(article: Dict) -> Dict:
+        meta = {key: article.get(key) for key in
+                ('url', 'title', 'publish_date', 'crawl_time', 'etag', 'last_modified')}
+        meta['content_length'] = len(article.get('content', ''))
+        return meta
+
+    @staticmethod
+    def _to_row(article: Dict) -> tuple:
+        return (
+            article['url'],
+            article.get('title'),
+            article.get('publish_date'),
+            # 重复页面的正文已保存在原始文章中，近似页面保留自己的正文
+            '' if article.get('canonical_url') else article.get('content', ''),
+            article.get('crawl_time'),
+            article.get('preview'),
+            json.dumps(article.get('links', []), ensure_ascii=False),
+            article.get('etag'),
+            article.get('last_modified'),
+            len(article.get('content', '')),
+            article.get('content_hash'),
+            to_signed(article['simhash']) if article.get('simhash') is not None else None,
+            article.get('canonical_url'),
+            article.get('similar_url'),
+        )
+
+    @staticmethod
+    def _from_row(row: tuple) -> Dict:
+        (url, title, date, content, crawl_time, preview, links, etag, last_modified,
+         canonical_url, content_hash, simhash, similar_url) = row
+        content = content or ''
+        if preview is None:
+            # 旧库中的记录没有预览，按 fetch_page 的规则生成
+            preview = content[:200] + '...' if len(content) > 200 else content
+        return {
+            'url': url,
+            'title': title or '无标题',
+            'publish_date': date or '',
+            'preview': preview,
+            'content': content,
+            'links': json.loads(links) if links else [],
+            'crawl_time': crawl_time,
+            'etag': etag,
+            'last_modified': last_modified,
+            'canonical_url': canonical_url,
+            'content_hash': content_hash,
+            'simhash': to_unsigned(simhash) if simhash is not None else None,
+            'similar_url': similar_url,
+        }
+
+
+class ArticleCache:
+    """按需加载的文章缓存，内存占用与文章总数无关
+
+    打开时只统计文章数量和正文总长度，不读取任何文章：
+    - meta() 返回文章的元数据（标题、日期、抓取时间、HTTP校验信息、正文长度），
+      最近使用的元数据保存在 LRU 中
+    - get() 返回完整文章，正文按需从 SQLite 读取，只在 LRU 中保留最近使用的少量正文
+    - put() 写入文章（由 ArticleStore 批量提交）并增量维护统计数据
+
+    属性:
+        store: 文章存储后端
+        max_bodies: 内存中最多保留的完整文章数
+        max_meta: 内存中最多保留的元数据条数
+        total_content_length: 全部文章的正文总长度
+    """
+
+    def __init__(self, store: ArticleStore, max_bodies: int = 256, max_meta: int = 100000):
+        self.store = store
+        self.max_bodies = max_bodies
+        self.max_meta = max_meta
+        self._lock = threading.RLock()
+        self._bodies: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._meta: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._count, self.total_content_length = store.totals()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, url: str) -> bool:
+        return self.meta(url) is not None
+
+    def meta(self, url: str) -> Optional[Dict]:
+        """返回文章元数据，不存在时返回None"""
+        with self._lock:
+            meta = self._meta.get(url)
+            if meta is not None:
+                self._meta.move_to_end(url)
+                return meta
+            meta = self.store.load_meta(url)
+            if meta is not None:
+                self._remember(self._meta, url, meta, self.max_meta)
+            return meta
+
+    def get(self, url: str, default=None) -> Optional[Dict]:
+        """返回完整文章（含正文），不存在时返回 default"""
+        with self._lock:
+            article = self._bodies.get(url)
+            if article is not None:
+                self._bodies.move_to_end(url)
+                return article
+            article = self.store.load_article(url)
+            if article is None:
+                return default
+            self._remember(self._bodies, url, article, self.max_bodies)
+            return article
+
+    def __getitem__(self, url: str) -> Dict:
+        article = self.get(url)
+        if article is None:
+            raise KeyError(url)
+        return article
+
+    def put(self, article_data: Dict):
+        """写入或更新一篇文章
+
+        Args:
+            article_data: 文章数据字典，必须包含 url 和 content
+        """
+        url = article_data['url']
+        with self._lock:
+            old = self.meta(url)
+            if old is None:
+                self._count += 1
+            else:
+                self.total_content_length -= old['content_length']
+            self.total_content_length += len(article_data['content'])
+            self.store.save(article_data)
+            self._remember(self._meta, url, self.store._to_meta(article_data), self.max_meta)
+            self._remember(self._bodies, url, article_data, self.max_bodies)
+
+    @staticmethod
+    def _remember(cache: OrderedDict, key: str, value: Dict, limit: int):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > limit:
+            cache.popitem(last=False)
@@ -0,0 +1,293 @@
+import socket
+import threading
+import time
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+try:
+    from urllib3.exceptions import NameResolutionError
+except ImportError:  # urllib3 1.26 没有该异常，DNS 失败同样报告为 NewConnectionError
+    NameResolutionError = None
+
+try:
+    import charset_normalizer
+except ImportError:  # requests 的依赖，通常总是可用
+    charset_normalizer = None
+
+try:
+    import brotli  # noqa: F401  安装后 urllib3 可自动解码 br
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+
+# 各阶段耗时名称，按请求时间顺序排列
+TIMING_PHASES = ('dns', 'connect', 'tls', 'ttfb', 'download', 'total')
+
+# 当前线程最近一次新建连接的耗时，由连接类写入、transport 读取
+_connect_timing = threading.local()
+
+
+def decode_body(content: bytes, encoding: Optional[str]) -> str:
+    """按响应编码解码响应体，规则与 requests.Response.text 一致
+
+    Args:
+        content: 响应体
+        encoding: 响应头声明的编码，缺失时自动探测
+
+    Returns:
+        str: 解码后的文本
+    """
+    if encoding is None and charset_normalizer is not None:
+        best = charset_normalizer.from_bytes(content).best()
+        encoding = best.encoding if best else None
+    try:
+        return content.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return content.decode('utf-8', errors='replace')
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    """记录DNS解析与TCP连接耗时的HTTP连接"""
+
+    def _new_conn(self):
+        # 域名只解析一次并单独计时，再依次连接解析出的地址：交给 urllib3 的是IP地址，
+        # 不会再次解析，连接耗时中也不含DNS
+        host = self._dns_host
+        start = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(host.strip('[]'), self.port, allowed_gai_family(),
+                                           socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            if NameResolutionError is None:
+                raise NewConnectionError(self, f'Failed to resolve {self.host!r} ({e})') from e
+            raise NameResolutionError(self.host, self, e) from e
+        resolved = time.perf_counter()
+        error = None
+        try:
+            for *_, address in addresses:
+                self._dns_host = address[0]
+                try:
+                    sock = super()._new_conn()
+                    break
+                except ConnectTimeoutError as e:  # 含 NewConnectionError，换下一个地址
+                    error = e
+            else:
+                raise error or NewConnectionError(self, 'getaddrinfo returns an empty list')
+        finally:
+            self._dns_host = host
+        _connect_timing.dns = resolved - start
+        _connect_timing.connect = time.perf_counter() - resolved
+        return sock
+
+    def connect(self):
+        start = time.perf_counter()
+        _connect_timing.dns = _connect_timing.connect = 0.0
+        super().connect()
+        # connect() 总耗时减去 DNS 和 TCP 部分即为 TLS 握手耗时
+        _connect_timing.tls = max(0.0, time.perf_counter() - start
+                                  - _connect_timing.dns - _connect_timing.connect)
+        _connect_timing.new = True
+
+
+class _TimedHTTPSConnection(_TimedHTTPConnection, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    """使用计时连接类的连接池适配器"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+class FetchResult:
+    """一次HTTP请求的结果
+
+    属性:
+        url: 最终URL（跟随重定向之后）
+        status_code: HTTP状态码
+        headers: 响应头
+        content: 响应体（已解压）
+        encoding: 响应编码
+        truncated: 响应体超过大小上限被截断时为True
+        rejected_type: Content-Type 不被接受、未读取响应体时为True
+        reused: 是否复用了已有连接
+        timing: 各阶段耗时（秒），键见 TIMING_PHASES
+    """
+
+    def __init__(self, url: str, status_code: int, headers, content: bytes,
+                 encoding: Optional[str], truncated: bool, reused: bool,
+                 timing: Dict[str, float], rejected_type: bool = False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+        self.truncated = truncated
+        self.reused = reused
+        self.timing = timing
+        self.rejected_type = rejected_type
+
+    @property
+    def text(self) -> str:
+        """按响应编码解码的文本，与 requests.Response.text 规则一致"""
+        return decode_body(self.content, self.encoding)
+
+
+class HttpTransport:
+    """带连接池的HTTP传输层
+
+    该类负责:
+    1. 每个站点一个 requests.Session，连接池大小可配置，长连接复用
+    2. 声明 gzip/deflate（安装 brotli 时还有 br）压缩
+    3. 流式读取响应体，超过大小上限立即断开
+    4. 连接超时与读取超时分别设置
+    5. 记录每次请求的 DNS / 连接 / TLS / 首字节 / 下载耗时
+
+    目前基于 requests（HTTP/1.1）。get() 的返回值与具体客户端无关，
+    换成支持 HTTP/2 的客户端时只需替换本类的实现。
+
+    属性:
+        pool_maxsize: 每个站点连接池的最大连接数
+        connect_timeout: 建立连接的超时（秒）
+        read_timeout: 读取响应的超时（秒）
+        max_body_size: 响应体大小上限（字节）
+    """
+
+    def __init__(self, pool_maxsize: int = 10, connect_timeout: float = 5,
+                 read_timeout: float = 10, max_body_size: int = 10 * 1024 * 1024,
+                 keep_alive: bool = True, user_agent: Optional[str] = None):
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_body_size = max_body_size
+        self.keep_alive = keep_alive
+        self.user_agent = user_agent
+
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, requests.Session] = {}
+        # 各阶段累计耗时与请求数，用于统计平均值
+        self._timing_totals = dict.fromkeys(TIMING_PHASES, 0.0)
+        self._request_count = 0
+        self._new_connections = 0
+
+    def _session(self, host: str) -> requests.Session:
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = _TimedAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+                session.headers['Connection'] = 'keep-alive' if self.keep_alive else 'close'
+                if self.user_agent:
+                    session.headers['User-Agent'] = self.user_agent
+                self._sessions[host] = session
+            return session
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None,
+            accept_type: Optional[Callable[[Optional[str]], bool]] = None) -> FetchResult:
+        """发送GET请求并流式读取响应体
+
+        Args:
+            url: 请求URL
+            headers: 额外的请求头
+            accept_type: 根据 Content-Type 判断是否读取响应体；返回False时
+                读到响应头即断开，不下载响应体
+
+        Returns:
+            FetchResult: 请求结果及各阶段耗时
+
+        Raises:
+            requests.RequestException: 网络错误或超时
+        """
+        session = self._session(urlparse(url).netloc)
+        _connect_timing.dns = _connect_timing.connect = _connect_timing.tls = 0.0
+        _connect_timing.new = False
+
+        start = time.perf_counter()
+        response = session.get(url, headers=headers, stream=True,
+                               timeout=(self.connect_timeout, self.read_timeout))
+        headers_done = time.perf_counter()
+        rejected_type = (accept_type is not None and response.status_code == 200
+                         and not accept_type(response.headers.get('Content-Type')))
+        try:
+            content, truncated = (b'', False) if rejected_type else self._read_body(response)
+        finally:
+            response.close()
+        end = time.perf_counter()
+
+        setup = _connect_timing.dns + _connect_timing.connect + _connect_timing.tls
+        timing = {
+            'dns': _connect_timing.dns,
+            'connect': _connect_timing.connect,
+            'tls': _connect_timing.tls,
+            'ttfb': max(0.0, headers_done - start - setup),
+            'download': end - headers_done,
+            'total': end - start,
+        }
+        self._record_timing(timing, _connect_timing.new)
+        return FetchResult(response.url, response.status_code, response.headers, content,
+                           response.encoding, truncated, not _connect_timing.new, timing,
+                           rejected_type)
+
+    def _read_body(self, response) -> tuple:
+        """读取响应体，超过 max_body_size 时截断"""
+        length = response.headers.get('Content-Length')
+        if length and length.isdigit() and int(length) > self.max_body_size:
+            return b'', True
+        chunks, size = [], 0
+        for chunk in response.iter_content(64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > self.max_body_size:
+                return b''.join(chunks)[:self.max_body_size], True
+        return b''.join(chunks), False
+
+    def _record_timing(self, timing: Dict[str, float], new_connection: bool):
+        with self._lock:
+            self._request_count += 1
+            self._new_connections += new_connection
+            for phase in TIMING_PHASES:
+                self._timing_totals[phase] += timing[phase]
+
+    def timing_stats(self) -> Dict:
+        """返回请求数、新建连接数及各阶段平均耗时（毫秒）"""
+        with self._lock:
+            count = self._request_count
+            stats = {'requests': count, 'new_connections': self._new_connections}
+            for phase in TIMING_PHASES:
+                stats[phase] = self._timing_totals[phase] / count * 1000 if count else 0.0
+            return stats
+
+    def close(self):
+        """关闭所有站点的连接池"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
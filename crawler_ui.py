@@ -0,0 +1,77 @@
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+
+class UiChannel:
+    """爬取线程到界面线程的更新通道
+
+    爬取线程只把更新写入通道，不直接调用 root.after；界面线程按固定频率
+    （见 drain）一次性取出全部更新：
+    - 进度文字只保留最新一条，多次更新合并为一次刷新
+    - 文章和错误信息按到达顺序排队，最多保留最近 max_entries 条，
+      超出的旧条目在显示之前就被丢弃
+    - 统计信息只记录“需要刷新”标志
+
+    文章在入队时即转换为只含显示字段的精简记录，不保留正文和链接。
+
+    属性:
+        max_entries: 等待显示的条目上限
+    """
+
+    def __init__(self, max_entries: int = 500):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._progress: Optional[str] = None
+        self._entries: deque = deque(maxlen=max_entries)
+        self._stats_dirty = False
+        self._dropped = 0
+
+    def set_progress(self, text: str):
+        """更新进度文字（只保留最新一条）"""
+        with self._lock:
+            self._progress = text
+
+    def add_article(self, article_data: Dict):
+        """加入一篇待显示的文章"""
+        entry = ('article', {
+            'title': article_data['title'],
+            'url': article_data['url'],
+            'publish_date': article_data.get('publish_date', ''),
+            'preview': article_data.get('preview', ''),
+        })
+        self._add(entry)
+
+    def add_message(self, text: str):
+        """加入一条待显示的文字信息（如错误信息）"""
+        self._add(('message', text))
+
+    def _add(self, entry: Tuple[str, object]):
+        with self._lock:
+            if len(self._entries) == self.max_entries:
+                self._dropped += 1
+            self._entries.append(entry)
+
+    def mark_stats(self):
+        """标记统计信息需要刷新"""
+        with self._lock:
+            self._stats_dirty = True
+
+    def drain(self) -> Tuple[Optional[str], List[Tuple[str, object]], bool, int]:
+        """取出自上次调用以来的全部更新，由界面线程调用
+
+        Returns:
+            Tuple: (最新进度文字或None, 待显示条目列表, 统计是否需要刷新,
+            因超出上限而丢弃的条目数)
+        """
+        with self._lock:
+            progress, self._progress = self._progress, None
+            entries = list(self._entries)
+            self._entries.clear()
+            stats_dirty, self._stats_dirty = self._stats_dirty, False
+            dropped, self._dropped = self._dropped, 0
+            return progress, entries, stats_dirty, dropped
+
+    def clear(self):
+        """丢弃尚未显示的全部更新"""
+        self.drain()